@@ -0,0 +1,189 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from data.model import LessonPlanStatus, ProgressStatus
+from data.utils import db, summary_ref, to_timestamp
+
+MASTERY_BINS = np.arange(0, 101, 10)
+DUE_PREVIEW = 10
+
+
+def node_columns(summary: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Columnar arrays of node ids, mastery levels and next review times."""
+    nodes = summary.get("nodes", {})
+    ids = np.array(list(nodes.keys()), dtype=object)
+    values = list(nodes.values())
+    mastery = np.array([value[0] for value in values], dtype=float).reshape(-1)
+    next_review = np.array([value[1] for value in values], dtype=float).reshape(-1)
+    return {"ids": ids, "mastery": mastery, "next_review": next_review}
+
+
+def progress_columns(summary: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Columnar arrays of per-lesson progress, tagged with a plan index."""
+    plans = summary.get("progress", {})
+    plan_ids = list(plans.keys())
+    plan_index, completed, scores = [], [], []
+    for i, lessons in enumerate(plans.values()):
+        for status, score, _ in lessons.values():
+            plan_index.append(i)
+            completed.append(status == ProgressStatus.COMPLETED.value)
+            scores.append(score)
+    return {
+        "plan_ids": np.array(plan_ids, dtype=object),
+        "plan_index": np.array(plan_index, dtype=int),
+        "completed": np.array(completed, dtype=bool),
+        "score": np.array(scores, dtype=float),
+    }
+
+
+def mastery_distribution(columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    mastery = columns["mastery"]
+    counts, _ = np.histogram(mastery, bins=MASTERY_BINS)
+    return {
+        "bins": MASTERY_BINS.tolist(),
+        "counts": counts.tolist(),
+        "average": round(float(mastery.mean()), 1) if len(mastery) else 0.0,
+    }
+
+
+def concepts_due(columns: Dict[str, np.ndarray], now: float) -> Dict[str, Any]:
+    due = columns["next_review"] <= now
+    order = np.argsort(columns["next_review"][due], kind="stable")[:DUE_PREVIEW]
+    return {
+        "count": int(due.sum()),
+        "concept_ids": columns["ids"][due][order].tolist(),
+    }
+
+
+def plan_progress(
+    columns: Dict[str, np.ndarray], plans: Dict[str, Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    n = len(columns["plan_ids"])
+    tracked = np.bincount(columns["plan_index"], minlength=n)
+    completed = np.bincount(
+        columns["plan_index"], weights=columns["completed"], minlength=n
+    )
+    score_sum = np.bincount(
+        columns["plan_index"], weights=columns["score"], minlength=n
+    )
+    mean_score = np.divide(
+        score_sum, tracked, out=np.zeros(n), where=tracked > 0
+    )
+
+    index = {plan_id: i for i, plan_id in enumerate(columns["plan_ids"])}
+    rollup = []
+    for plan_id in sorted(set(plans) | set(index)):
+        lesson_count = plans.get(plan_id, {}).get("lesson_count", 0)
+        i = index.get(plan_id)
+        done = int(completed[i]) if i is not None else 0
+        rollup.append(
+            {
+                "plan_id": plan_id,
+                "status": plans.get(plan_id, {}).get("status"),
+                "lesson_count": lesson_count,
+                "completed": done,
+                "percent_complete": round(100 * done / lesson_count, 1)
+                if lesson_count
+                else 0.0,
+                "average_mastery_score": round(float(mean_score[i]), 1)
+                if i is not None
+                else 0.0,
+            }
+        )
+    return rollup
+
+
+def streaks(activity_days: List[str], today: date) -> Dict[str, int]:
+    if not activity_days:
+        return {"current": 0, "longest": 0}
+    days = np.unique(
+        np.array([date.fromisoformat(day).toordinal() for day in activity_days])
+    )
+    # Runs of consecutive days split wherever the gap is more than one day
+    breaks = np.flatnonzero(np.diff(days) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(days)]))
+    lengths = ends - starts
+
+    # The current streak is still alive if the last active day was today or yesterday
+    current = int(lengths[-1]) if today.toordinal() - days[-1] <= 1 else 0
+    return {"current": current, "longest": int(lengths.max())}
+
+
+def compute_dashboard(summary: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Compute all dashboard rollups from a summary document in vectorized passes."""
+    now = now or datetime.now()
+    nodes = node_columns(summary)
+    progress = progress_columns(summary)
+    return {
+        "concept_count": len(nodes["ids"]),
+        "mastery": mastery_distribution(nodes),
+        "due": concepts_due(nodes, now.timestamp()),
+        "plans": plan_progress(progress, summary.get("plans", {})),
+        "streak": streaks(summary.get("activity_days", []), now.date()),
+    }
+
+
+def rebuild_summary(userId: str) -> Dict[str, Any]:
+    """
+    Build a user's summary document from a full scan. Writes merge partial
+    entries into the summary as they happen, so only a rebuilt summary is
+    marked built and known to cover everything written before it.
+    """
+    userdb = db.collection("users").document(userId)
+    graphref = userdb.collection("knowledgeGraph")
+    summary = {"nodes": {}, "plans": {}, "progress": {}, "activity_days": []}
+
+    for node in graphref.document("nodeHolder").collection("nodes").stream():
+        data = node.to_dict()
+        summary["nodes"][node.id] = [
+            data.get("mastery_level", 0),
+            to_timestamp(data.get("next_review")),
+        ]
+
+    days = set()
+    for plan in userdb.collection("lessonPlans").stream():
+        lesson_count = len(list(plan.reference.collection("lessons").list_documents()))
+        summary["plans"][plan.id] = {
+            "lesson_count": lesson_count,
+            "status": plan.to_dict().get("status"),
+        }
+        lessons = {}
+        for progress in plan.reference.collection("progress").stream():
+            data = progress.to_dict()
+            last_accessed = to_timestamp(data.get("last_accessed"))
+            lessons[progress.id] = [
+                data.get("status", ProgressStatus.NOT_STARTED.value),
+                data.get("mastery_score", 0),
+                last_accessed,
+            ]
+            if last_accessed:
+                days.add(datetime.fromtimestamp(last_accessed).date().isoformat())
+        if lessons:
+            summary["progress"][plan.id] = lessons
+
+    for plan in userdb.collection("archivedPlans").select(["lesson_count"]).stream():
+        summary["plans"].setdefault(
+            plan.id,
+            {
+                "lesson_count": plan.to_dict().get("lesson_count", 0),
+                "status": LessonPlanStatus.ARCHIVED.value,
+            },
+        )
+
+    summary["activity_days"] = sorted(days)
+    summary["built"] = True
+    summary_ref(userId).set(summary)
+    return summary
+
+
+def get_dashboard(userId: str) -> Dict[str, Any]:
+    """Serve dashboard rollups from the user's summary document."""
+    snapshot = summary_ref(userId).get()
+    summary = snapshot.to_dict() if snapshot.exists else None
+    # A summary created by incremental writes alone is missing older data
+    if not summary or not summary.get("built"):
+        summary = rebuild_summary(userId)
+    return compute_dashboard(summary)
@@ -0,0 +1,235 @@
+import base64
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from firebase_admin import firestore
+
+from data.content_store import MAX_INLINE_BYTES, compress, decompress
+from data.model import LessonPlanStatus
+from data.utils import commit_in_batches, db, summary_ref
+
+# Plans not opened for this long are moved to cold storage by the sweeper
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+SWEEP_BATCH = 100
+
+
+def encode_document(value: Any) -> Any:
+    """Make Firestore values JSON-safe, tagging datetimes and bytes."""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, dict):
+        return {key: encode_document(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_document(item) for item in value]
+    return value
+
+
+def decode_document(value: Any) -> Any:
+    """Inverse of encode_document()."""
+    if isinstance(value, dict):
+        if set(value) == {"$datetime"}:
+            return datetime.fromisoformat(value["$datetime"])
+        if set(value) == {"$bytes"}:
+            return base64.b64decode(value["$bytes"])
+        return {key: decode_document(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_document(item) for item in value]
+    return value
+
+
+def _plan_ref(userId: str, planId: str):
+    return db.collection("users").document(userId).collection("lessonPlans").document(planId)
+
+
+def _archive_ref(userId: str, planId: str):
+    return db.collection("users").document(userId).collection("archivedPlans").document(planId)
+
+
+def write_snapshot(archive_ref, snapshot: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+    """
+    Store a compressed snapshot, split into chunk documents when it is too
+    large for one document. Chunks go first, so an archive document always
+    points at a complete snapshot.
+    """
+    codec, data = compress(json.dumps(encode_document(snapshot)).encode("utf-8"))
+    chunks = [
+        data[i : i + MAX_INLINE_BYTES] for i in range(0, len(data), MAX_INLINE_BYTES)
+    ]
+    document = {**metadata, "codec": codec}
+    if len(chunks) == 1:
+        document["data"] = data
+    else:
+        document["chunk_count"] = len(chunks)
+        for index, chunk in enumerate(chunks):
+            archive_ref.collection("chunks").document(str(index)).set({"data": chunk})
+    archive_ref.set(document)
+
+
+def read_snapshot(archive_ref, document: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of write_snapshot(), given the archive document's data."""
+    if "data" in document:
+        data = document["data"]
+    else:
+        chunks = [
+            archive_ref.collection("chunks").document(str(index)).get()
+            for index in range(document["chunk_count"])
+        ]
+        data = b"".join(chunk.to_dict()["data"] for chunk in chunks)
+    return decode_document(
+        json.loads(decompress(document["codec"], data).decode("utf-8"))
+    )
+
+
+def archive_lesson_plan(userId: str, planId: str) -> bool:
+    """
+    Compact a plan, its lessons and its progress into one compressed snapshot
+    under archivedPlans and delete the hot documents.
+    """
+    plan_ref = _plan_ref(userId, planId)
+    plan = plan_ref.get()
+    if not plan.exists:
+        return False
+
+    lessons = list(plan_ref.collection("lessons").stream())
+    progress = list(plan_ref.collection("progress").stream())
+    snapshot = {
+        "plan": plan.to_dict(),
+        "lessons": {lesson.id: lesson.to_dict() for lesson in lessons},
+        "progress": {item.id: item.to_dict() for item in progress},
+    }
+    # Lesson bodies usually live in the content store, but lessons written
+    # before it still carry inline content, so large snapshots are chunked
+    plan_data = snapshot["plan"]
+    write_snapshot(
+        _archive_ref(userId, planId),
+        snapshot,
+        {
+            "archived_at": datetime.now(),
+            "description": plan_data.get("description"),
+            "last_accessed": plan_data.get("last_accessed"),
+            "lesson_count": len(lessons),
+        },
+    )
+    commit_in_batches(
+        [("delete", doc.reference) for doc in lessons + progress]
+        + [("delete", plan_ref)]
+    )
+    summary_ref(userId).set(
+        {"plans": {planId: {"status": LessonPlanStatus.ARCHIVED.value}}}, merge=True
+    )
+    return True
+
+
+def rehydrate_lesson_plan(userId: str, planId: str) -> bool:
+    """Restore an archived plan to live documents, returning False if none exists."""
+    archive_ref = _archive_ref(userId, planId)
+    archived = archive_ref.get()
+    if not archived.exists:
+        return False
+
+    document = archived.to_dict()
+    snapshot = read_snapshot(archive_ref, document)
+    plan_ref = _plan_ref(userId, planId)
+    plan = {
+        **snapshot["plan"],
+        "status": LessonPlanStatus.ACTIVE.value,
+        "last_accessed": datetime.now(),
+    }
+    operations = [("set", plan_ref, plan)]
+    operations += [
+        ("set", plan_ref.collection("lessons").document(lessonId), lesson)
+        for lessonId, lesson in snapshot["lessons"].items()
+    ]
+    operations += [
+        ("set", plan_ref.collection("progress").document(lessonId), progress)
+        for lessonId, progress in snapshot["progress"].items()
+    ]
+    # The archive is deleted after the live documents are written so a failed
+    # restore can simply be retried, and before its chunks so it never points
+    # at missing ones
+    operations.append(("delete", archive_ref))
+    operations += [
+        ("delete", archive_ref.collection("chunks").document(str(index)))
+        for index in range(document.get("chunk_count", 0))
+    ]
+    commit_in_batches(operations)
+    summary_ref(userId).set(
+        {"plans": {planId: {"status": LessonPlanStatus.ACTIVE.value}}}, merge=True
+    )
+    return True
+
+
+def list_archived_plans(userId: str) -> List[Dict[str, Any]]:
+    """Archived plan metadata without decompressing any snapshot."""
+    archived = db.collection("users").document(userId).collection("archivedPlans")
+    return [
+        {
+            "plan_id": plan.id,
+            **{
+                key: value
+                for key, value in plan.to_dict().items()
+                if key not in ("codec", "data", "chunk_count")
+            },
+        }
+        for plan in archived.select(
+            ["archived_at", "description", "last_accessed", "lesson_count"]
+        ).stream()
+    ]
+
+
+def acquire_sweep_lease(holder: str, ttl_seconds: float) -> bool:
+    """
+    Take or renew the lease that lets one process sweep. Every worker of
+    every instance runs the sweep loop, but only the lease holder archives.
+    """
+    lease_ref = db.collection("system").document("archiveSweeper")
+
+    @firestore.transactional
+    def acquire(transaction):
+        snapshot = lease_ref.get(transaction=transaction)
+        lease = snapshot.to_dict() if snapshot.exists else {}
+        now = time.time()
+        if lease.get("holder") not in (None, holder) and lease.get("expires_at", 0) > now:
+            return False
+        transaction.set(lease_ref, {"holder": holder, "expires_at": now + ttl_seconds})
+        return True
+
+    return acquire(db.transaction())
+
+
+def release_sweep_lease(holder: str) -> None:
+    """Give up the lease on shutdown so another process takes over right away."""
+    lease_ref = db.collection("system").document("archiveSweeper")
+    snapshot = lease_ref.get()
+    if snapshot.exists and snapshot.to_dict().get("holder") == holder:
+        lease_ref.delete()
+
+
+def sweep_stale_plans(
+    max_age_days: int = ARCHIVE_AFTER_DAYS, limit: int = SWEEP_BATCH
+) -> int:
+    """Archive plans marked archived or not accessed within max_age_days."""
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    plans = db.collection_group("lessonPlans")
+    candidates = list(
+        plans.where("status", "==", LessonPlanStatus.ARCHIVED.value).limit(limit).stream()
+    ) + list(plans.where("last_accessed", "<", cutoff).limit(limit).stream())
+
+    archived = 0
+    seen = set()
+    for plan in candidates:
+        userId = plan.reference.parent.parent.id
+        if (userId, plan.id) in seen:
+            continue
+        seen.add((userId, plan.id))
+        try:
+            archived += archive_lesson_plan(userId, plan.id)
+        except Exception as e:
+            print(f"Error archiving lesson plan {userId}/{plan.id}: {e}")
+    return archived
+
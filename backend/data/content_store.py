@@ -0,0 +1,158 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+
+from google.api_core.exceptions import AlreadyExists
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available, zstd is used when installed
+    zstandard = None
+
+
+PREVIEW_LENGTH = 280
+
+# Firestore rejects documents over 1 MiB, leave headroom for the other fields
+MAX_INLINE_BYTES = 900_000
+
+
+def content_hash(body: str) -> str:
+    """Return the content address (sha256 hex digest) of a lesson body."""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def make_preview(body: str, length: int = PREVIEW_LENGTH) -> str:
+    """Return a short plain preview of a lesson body for list views."""
+    preview = " ".join(body.split())
+    if len(preview) <= length:
+        return preview
+    return preview[: length - 1].rstrip() + "…"
+
+
+def compress(raw: bytes) -> tuple[str, bytes]:
+    """Compress bytes with the best available codec, returning (codec, data)."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """Decompress bytes written by compress()."""
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd content")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown content codec '{codec}'")
+
+
+class ContentStore:
+    """
+    Content-addressed store for lesson bodies.
+    Path: /lessonContent/{sha256}[/chunks/{index}]
+
+    Each unique body is stored once, compressed, and shared between users.
+    Lesson documents only keep the hash and a preview.
+    """
+
+    def __init__(self, collection, cache_size: int = 256):
+        self.collection = collection
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = Lock()
+
+    def put(self, body: str) -> str:
+        """Store a lesson body if it is not stored yet and return its hash."""
+        digest = content_hash(body)
+        if self._cached(digest) is not None:
+            return digest
+
+        raw = body.encode("utf-8")
+        codec, data = compress(raw)
+        doc_ref = self.collection.document(digest)
+        chunks = [
+            data[i : i + MAX_INLINE_BYTES]
+            for i in range(0, len(data), MAX_INLINE_BYTES)
+        ]
+        document = {
+            "codec": codec,
+            "size": len(raw),
+            "compressed_size": len(data),
+            "created_at": datetime.now(),
+        }
+        if len(chunks) == 1:
+            document["data"] = data
+        else:
+            document["chunk_count"] = len(chunks)
+
+        # Bodies are immutable, so the first writer's document wins. Chunks are
+        # only written by the writer whose create() succeeded, so they always
+        # match the codec recorded on the parent document.
+        try:
+            doc_ref.create(document)
+        except AlreadyExists:
+            existing = doc_ref.get().to_dict() or {}
+            # Finish a chunked body whose first writer died part way through
+            if (
+                len(chunks) > 1
+                and existing.get("codec") == codec
+                and existing.get("chunk_count") == len(chunks)
+                and existing.get("compressed_size") == len(data)
+                and self._stored_chunks(doc_ref) < len(chunks)
+            ):
+                self._write_chunks(doc_ref, chunks)
+        else:
+            if len(chunks) > 1:
+                self._write_chunks(doc_ref, chunks)
+
+        self._remember(digest, body)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the lesson body stored under a hash, or None if missing."""
+        body = self._cached(digest)
+        if body is not None:
+            return body
+
+        doc_ref = self.collection.document(digest)
+        snapshot = doc_ref.get()
+        if not snapshot.exists:
+            return None
+        document = snapshot.to_dict()
+        if "data" in document:
+            data = document["data"]
+        else:
+            chunks = doc_ref.collection("chunks").stream()
+            ordered = sorted(chunks, key=lambda chunk: int(chunk.id))
+            if len(ordered) < document["chunk_count"]:
+                return None  # Still being written
+            data = b"".join(chunk.to_dict()["data"] for chunk in ordered)
+
+        body = decompress(document["codec"], data).decode("utf-8")
+        self._remember(digest, body)
+        return body
+
+    def _write_chunks(self, doc_ref, chunks) -> None:
+        for index, chunk in enumerate(chunks):
+            doc_ref.collection("chunks").document(str(index)).set({"data": chunk})
+
+    def _stored_chunks(self, doc_ref) -> int:
+        return sum(1 for _ in doc_ref.collection("chunks").list_documents())
+
+    def _cached(self, digest: str) -> Optional[str]:
+        with self._lock:
+            body = self._cache.get(digest)
+            if body is not None:
+                self._cache.move_to_end(digest)
+            return body
+
+    def _remember(self, digest: str, body: str) -> None:
+        with self._lock:
+            self._cache[digest] = body
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,212 @@
+import json
+import re
+import uuid
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError, create_model
+from pydantic_core import from_json
+
+from data.model import (
+    FirestoreModel,
+    KnowledgeEdge,
+    KnowledgeNode,
+    Lesson,
+    LessonPlan,
+    RelationshipType,
+)
+
+
+def generation_model(
+    name: str,
+    source: Type[FirestoreModel],
+    fields: List[str],
+    **extra: Any,
+) -> Type[FirestoreModel]:
+    """
+    Build a response model from a subset of a data.model model's fields, so
+    generated output is constrained by the same schema the data layer uses.
+    """
+    definitions = {
+        field: (source.model_fields[field].annotation, source.model_fields[field])
+        for field in fields
+    }
+    return create_model(name, __base__=FirestoreModel, **definitions, **extra)
+
+
+GeneratedLesson = generation_model(
+    "GeneratedLesson",
+    Lesson,
+    ["lesson_id", "title", "objectives", "content", "external_resources", "order"],
+)
+
+GeneratedLessonPlan = generation_model(
+    "GeneratedLessonPlan",
+    LessonPlan,
+    ["plan_id", "title", "description", "source_prompt"],
+    user_id=(str, ...),
+    lessons=(List[GeneratedLesson], Field(min_length=1)),
+)
+
+GeneratedKnowledgeNode = generation_model(
+    "GeneratedKnowledgeNode",
+    KnowledgeNode,
+    ["concept_id", "name", "description", "mastery_level", "source_lesson_id"],
+)
+
+GeneratedKnowledgeEdge = generation_model(
+    "GeneratedKnowledgeEdge",
+    KnowledgeEdge,
+    ["edge_id", "source_concept_id", "target_concept_id", "relationship_type"],
+)
+
+GeneratedKnowledgeGraph = create_model(
+    "GeneratedKnowledgeGraph",
+    __base__=FirestoreModel,
+    user_id=(str, ...),
+    nodes=(List[GeneratedKnowledgeNode], ...),
+    edges=(List[GeneratedKnowledgeEdge], Field(default_factory=list)),
+)
+
+
+def schema_instructions(model: Type[BaseModel]) -> str:
+    """Instruction text carrying a model's JSON schema, for agents without response_model."""
+    schema = json.dumps(model.model_json_schema(by_alias=False))
+    return f"Your output must be JSON matching this JSON schema:\n{schema}"
+
+
+class GenerationMetrics:
+    """Counts how often generated output validated, needed repair, or failed."""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = Lock()
+
+    def record(self, model: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(
+                model, {"valid": 0, "repaired": 0, "failed": 0}
+            )
+            counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            snapshot = {}
+            for model, counts in self._counts.items():
+                total = sum(counts.values())
+                snapshot[model] = {
+                    **counts,
+                    "total": total,
+                    # Repaired outputs are retries that did not have to happen
+                    "retries_avoided": counts["repaired"],
+                    "retry_rate": round(counts["failed"] / total, 4) if total else 0.0,
+                }
+            return snapshot
+
+
+generation_metrics = GenerationMetrics()
+
+# Near-miss key names seen in model output, mapped to the schema's names
+KEY_ALIASES = {
+    "plan_title": "title",
+    "planTitle": "title",
+    "lesson_title": "title",
+    "concept_name": "name",
+    "relationship": "relationship_type",
+    "source": "source_concept_id",
+    "target": "target_concept_id",
+    "resources": "external_resources",
+}
+LIST_FIELDS = {"objectives", "external_resources", "externalResources"}
+INT_FIELDS = {"order", "mastery_level", "masteryLevel"}
+PERCENT_FIELDS = {"mastery_level", "masteryLevel"}
+ID_FIELDS = {"lesson_id": "lesson", "plan_id": "plan", "concept_id": "concept", "edge_id": "edge"}
+CONTAINERS = {"lessons": "lesson_id", "nodes": "concept_id", "edges": "edge_id"}
+
+
+def extract_json(text: str) -> Any:
+    """Pull JSON out of model output wrapped in prose or code fences, tolerating truncation."""
+    fenced = re.search(r"```(?:json)?\s*(.*?)(```|$)", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON found in model output")
+    return from_json(text[min(starts) :].strip(), allow_partial=True)
+
+
+def _coerce_int(value: Any) -> Any:
+    if isinstance(value, str):
+        match = re.search(r"-?\d+", value)
+        if match:
+            value = int(match.group())
+    if isinstance(value, float):
+        value = int(value)
+    return value
+
+
+def _normalize(value: Any, container: Optional[str] = None) -> Any:
+    if isinstance(value, list):
+        return [_normalize(item, container) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    normalized = {}
+    for key, item in value.items():
+        key = KEY_ALIASES.get(key, key)
+        if key in LIST_FIELDS and isinstance(item, str):
+            item = [part.strip() for part in re.split(r"\n|;", item) if part.strip()]
+        elif key in INT_FIELDS:
+            item = _coerce_int(item)
+            if key in PERCENT_FIELDS and isinstance(item, int):
+                item = max(0, min(100, item))
+        elif key in ("relationship_type", "relationshipType") and isinstance(item, str):
+            item = item.strip().lower().replace(" ", "_").replace("-", "_")
+            if item not in {member.value for member in RelationshipType}:
+                item = RelationshipType.RELATED_TO.value
+        elif key in CONTAINERS:
+            item = _normalize(item, key)
+        normalized[key] = item
+
+    id_field = CONTAINERS.get(container)
+    if id_field and not (normalized.get(id_field) or normalized.get(_camel(id_field))):
+        normalized[id_field] = f"{ID_FIELDS[id_field]}_{uuid.uuid4().hex[:12]}"
+    if "lessons" in normalized and not normalized.get("plan_id") and not normalized.get("planId"):
+        normalized["plan_id"] = f"plan_{uuid.uuid4().hex[:12]}"
+    return normalized
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+def repair_output(output: Any, model: Type[BaseModel]) -> Tuple[BaseModel, bool]:
+    """
+    Validate generated output against a model, repairing near misses locally
+    instead of asking the model again. Returns (instance, repaired).
+    Raises ValidationError or ValueError when the output cannot be repaired.
+    """
+    name = model.__name__
+    try:
+        if isinstance(output, str):
+            instance = model.model_validate_json(output)
+        else:
+            instance = model.model_validate(output)
+        generation_metrics.record(name, "valid")
+        return instance, False
+    except (ValidationError, ValueError):
+        pass
+
+    try:
+        data = extract_json(output) if isinstance(output, str) else output
+        # A bare list of lessons or nodes is wrapped in its container
+        if isinstance(data, list):
+            key = "lessons" if "lessons" in model.model_fields else "nodes"
+            data = {key: data}
+        instance = model.model_validate(_normalize(data))
+    except (ValidationError, ValueError) as e:
+        generation_metrics.record(name, "failed")
+        raise e
+    generation_metrics.record(name, "repaired")
+    return instance, True
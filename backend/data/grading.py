@@ -0,0 +1,505 @@
+import asyncio
+import json
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from firebase_admin import firestore
+from pydantic import ValidationError
+
+from data import learning_path
+from data.content_store import content_hash
+from data.model import ContentBlock, ContentType, ProgressStatus
+from data.utils import (
+    MAX_BATCH_WRITES,
+    bump_write_version,
+    commit_in_batches,
+    content_store,
+    db,
+    restore_archived_plan,
+    summary_ref,
+    to_timestamp,
+    touch_lesson_plan,
+    write_progress,
+)
+
+# Score a quiz session needs for its concepts to count as reviewed successfully
+PASS_SCORE = int(os.getenv("QUIZ_PASS_SCORE", "70"))
+# Weight of the newest session when blending it into an existing mastery value
+SESSION_WEIGHT = 0.6
+MAX_REVIEW_INTERVAL_DAYS = 180
+
+# How long to wait for more submissions before grading them together
+BATCH_WINDOW_SECONDS = float(os.getenv("QUIZ_BATCH_WINDOW", "0.05"))
+MAX_BATCH_SIZE = int(os.getenv("QUIZ_MAX_BATCH", "200"))
+
+# Firestore allows at most 30 values per "in" filter
+MAX_IN_VALUES = 30
+
+
+def normalize_answer(answer: Any) -> str:
+    """Casefold and collapse whitespace and trailing punctuation."""
+    return re.sub(r"\s+", " ", str(answer)).strip().rstrip(".!?").casefold()
+
+
+def _accepted_answers(question: Dict[str, Any]) -> Set[str]:
+    answers = []
+    for key in ("correct", "answer", "correct_answer", "correctAnswer", "answers"):
+        value = question.get(key)
+        if value is None:
+            continue
+        answers.extend(value if isinstance(value, list) else [value])
+
+    # Multiple choice answers may be given as an option index or letter
+    options = question.get("options") or question.get("choices") or []
+    accepted = set()
+    for answer in answers:
+        if isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < len(options):
+            accepted.add(normalize_answer(options[answer]))
+            accepted.add(chr(ord("a") + answer))
+        accepted.add(normalize_answer(answer))
+    for index, option in enumerate(options):
+        if normalize_answer(option) in accepted:
+            accepted.add(chr(ord("a") + index))
+            accepted.add(str(index))
+    return accepted
+
+
+def _content_blocks(content: str) -> List[ContentBlock]:
+    try:
+        parsed = json.loads(content)
+    except (TypeError, ValueError):
+        return []  # Plain text lessons have no quiz
+    if isinstance(parsed, dict):
+        parsed = parsed.get("blocks") or parsed.get("content") or [parsed]
+    blocks = []
+    for item in parsed if isinstance(parsed, list) else []:
+        try:
+            blocks.append(ContentBlock.model_validate(item))
+        except ValidationError:
+            continue
+    return blocks
+
+
+def compile_answer_key(content: str) -> Dict[str, Set[str]]:
+    """Map each quiz question id in a lesson body to its accepted normalized answers."""
+    key = {}
+    index = 0
+    for block in _content_blocks(content):
+        if block.type != ContentType.QUIZ:
+            continue
+        for question in block.questions:
+            questionId = str(
+                question.get("question_id")
+                or question.get("questionId")
+                or question.get("id")
+                or f"q{index}"
+            )
+            key[questionId] = _accepted_answers(question)
+            index += 1
+    return key
+
+
+class AnswerKeyCache:
+    """
+    Compiled answer keys keyed by content hash. Lessons share bodies through
+    the content store, so one compiled key serves every copy of a lesson.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self._keys: OrderedDict[str, Dict[str, Set[str]]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, lesson: Dict[str, Any]) -> Dict[str, Set[str]]:
+        digest = lesson.get("content_ref") or content_hash(lesson.get("content") or "")
+        with self._lock:
+            if digest in self._keys:
+                self._keys.move_to_end(digest)
+                return self._keys[digest]
+
+        if "content_ref" in lesson:
+            content = content_store.get(lesson["content_ref"])
+        else:
+            content = lesson.get("content") or ""
+        key = compile_answer_key(content)
+        with self._lock:
+            self._keys[digest] = key
+            if len(self._keys) > self.size:
+                self._keys.popitem(last=False)
+        return key
+
+
+answer_keys = AnswerKeyCache()
+
+
+class WriteRecorder:
+    """Collects one user's writes so they can be committed with other users'."""
+
+    def __init__(self):
+        self.operations = []
+
+    def set(self, ref, data, merge=False):
+        self.operations.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self.operations.append(("update", ref, data))
+
+
+def commit_per_user(writes: Dict[str, List[tuple]]) -> Dict[str, Exception]:
+    """
+    Commit every user's writes in as few batches as fit, never splitting a
+    user across batches unless they alone exceed one. A failed batch is
+    retried user by user, so one bad write only fails its own user.
+    Returns the users whose writes could not be committed.
+    """
+    groups: List[List[str]] = [[]]
+    size = 0
+    for userId, operations in writes.items():
+        if groups[-1] and size + len(operations) > MAX_BATCH_WRITES:
+            groups.append([])
+            size = 0
+        groups[-1].append(userId)
+        size += len(operations)
+
+    failed: Dict[str, Exception] = {}
+    for group in groups:
+        try:
+            commit_in_batches([operation for userId in group for operation in writes[userId]])
+        except Exception as e:
+            if len(group) == 1:
+                failed[group[0]] = e
+                continue
+            for userId in group:
+                try:
+                    commit_in_batches(writes[userId])
+                except Exception as user_error:
+                    failed[userId] = user_error
+    return failed
+
+
+def blend(previous: Optional[int], score: int) -> int:
+    if previous is None:
+        return score
+    return round(SESSION_WEIGHT * score + (1 - SESSION_WEIGHT) * previous)
+
+
+def next_interval(previous: int, score: int) -> int:
+    """Double the review interval after a passing session, restart it otherwise."""
+    if score < PASS_SCORE:
+        return 1
+    return min(max(previous or 1, 1) * 2, MAX_REVIEW_INTERVAL_DAYS)
+
+
+def _lesson_ref(userId: str, planId: str, lessonId: str):
+    userdb = db.collection("users").document(userId)
+    plan_ref = userdb.collection("lessonPlans").document(planId)
+    return plan_ref.collection("lessons").document(lessonId)
+
+
+def _progress_ref(userId: str, planId: str, lessonId: str):
+    userdb = db.collection("users").document(userId)
+    plan_ref = userdb.collection("lessonPlans").document(planId)
+    return plan_ref.collection("progress").document(lessonId)
+
+
+def _linked_nodes(lessons: Set[Tuple[str, str]]) -> Dict[Tuple[str, str], List[Any]]:
+    """Knowledge nodes per (userId, lessonId), one query per user and 30 lessons."""
+    by_user: Dict[str, List[str]] = {}
+    for userId, lessonId in lessons:
+        by_user.setdefault(userId, []).append(lessonId)
+
+    nodes: Dict[Tuple[str, str], List[Any]] = {}
+    for userId, lessonIds in by_user.items():
+        node_holder = (
+            db.collection("users")
+            .document(userId)
+            .collection("knowledgeGraph")
+            .document("nodeHolder")
+            .collection("nodes")
+        )
+        for start in range(0, len(lessonIds), MAX_IN_VALUES):
+            chunk = lessonIds[start : start + MAX_IN_VALUES]
+            for node in node_holder.where("source_lesson_id", "in", chunk).stream():
+                key = (userId, node.get("source_lesson_id"))
+                nodes.setdefault(key, []).append(node)
+    return nodes
+
+
+def score_answers(
+    key: Dict[str, Set[str]], answers: List[Dict[str, Any]], now: datetime
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Score one quiz session against its answer key, returning (score, attempts).
+    Only questions in the key count, each once, with the last answer given.
+    """
+    latest = {}
+    for answer in answers:
+        questionId = str(answer["questionId"])
+        if questionId in key:
+            latest[questionId] = str(answer["answer"])
+    attempts = [
+        {
+            "question_id": questionId,
+            "user_answer": answer,
+            "is_correct": normalize_answer(answer) in key[questionId],
+            "timestamp": now,
+        }
+        for questionId, answer in latest.items()
+    ]
+    correct = sum(attempt["is_correct"] for attempt in attempts)
+    score = max(0, min(100, round(100 * correct / len(key))))
+    return score, attempts
+
+
+def _read_documents(
+    submissions: List[Dict[str, Any]]
+) -> Dict[Tuple[str, str, str, str], Dict[str, Any]]:
+    """Lesson and progress documents for submissions, in one get_all."""
+    refs = {}
+    for submission in submissions:
+        ids = (submission["userId"], submission["planId"], submission["lessonId"])
+        refs[("lesson", *ids)] = _lesson_ref(*ids)
+        refs[("progress", *ids)] = _progress_ref(*ids)
+    by_path = {ref.path: key for key, ref in refs.items()}
+    return {
+        by_path[snapshot.reference.path]: snapshot.to_dict()
+        for snapshot in db.get_all(list(refs.values()))
+        if snapshot.exists
+    }
+
+
+def _read_user_documents(
+    userId: str, submissions: List[Dict[str, Any]]
+) -> Dict[Tuple[str, str, str, str], Dict[str, Any]]:
+    documents = _read_documents(submissions)
+    # Quizzes of archived plans are graded after restoring the plan
+    missing = {
+        submission["planId"]
+        for submission in submissions
+        if ("lesson", userId, submission["planId"], submission["lessonId"]) not in documents
+    }
+    restored = [planId for planId in missing if restore_archived_plan(userId, planId)]
+    if restored:
+        documents.update(
+            _read_documents(
+                [submission for submission in submissions if submission["planId"] in restored]
+            )
+        )
+    return documents
+
+
+def _grade_user(
+    userId: str,
+    submissions: List[Tuple[int, Dict[str, Any]]],
+    documents: Dict[Tuple[str, str, str, str], Dict[str, Any]],
+    results: List[Optional[Dict[str, Any]]],
+    now: datetime,
+) -> Tuple[WriteRecorder, List[Tuple[str, int]]]:
+    """Score one user's sessions and record, but not commit, their writes."""
+    sessions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for position, submission in submissions:
+        ids = (userId, submission["planId"], submission["lessonId"])
+        lesson = documents.get(("lesson", *ids))
+        if lesson is None:
+            results[position] = {**_result_ids(ids), "error": "Unknown lesson"}
+            continue
+        key = answer_keys.get(lesson)
+        if not key:
+            results[position] = {**_result_ids(ids), "error": "Lesson has no quiz"}
+            continue
+
+        score, attempts = score_answers(key, submission["answers"], now)
+        # Repeat sessions for the same lesson in one batch: the last one scores
+        session = sessions.setdefault(ids, {"attempts": [], "results": []})
+        session["attempts"] += attempts
+        session["score"] = score
+        results[position] = {
+            **_result_ids(ids),
+            "score": score,
+            "correct": sum(attempt["is_correct"] for attempt in attempts),
+            "total": len(key),
+            "answers": [
+                {"questionId": attempt["question_id"], "isCorrect": attempt["is_correct"]}
+                for attempt in attempts
+            ],
+        }
+        session["results"].append(results[position])
+
+    writer = WriteRecorder()
+    mastery_updates = []
+    summary_nodes: Dict[str, Any] = {}
+    nodes = _linked_nodes({(userId, lessonId) for _, _, lessonId in sessions})
+    for ids, session in sessions.items():
+        _, planId, lessonId = ids
+        progress = documents.get(("progress", *ids)) or {}
+        mastery = blend(
+            progress.get("mastery_score") if progress.get("quiz_attempts") else None,
+            session["score"],
+        )
+        write_progress(
+            userId,
+            planId,
+            {
+                "lesson_id": lessonId,
+                "status": (
+                    ProgressStatus.COMPLETED.value
+                    if mastery >= PASS_SCORE
+                    else ProgressStatus.IN_PROGRESS.value
+                ),
+                "last_accessed": now,
+                "mastery_score": mastery,
+                "quiz_attempts": firestore.ArrayUnion(session["attempts"]),
+            },
+            batch=writer,
+        )
+        for result in session["results"]:
+            result["masteryScore"] = mastery
+
+        for node in nodes.get((userId, lessonId), []):
+            data = node.to_dict()
+            level = blend(data.get("mastery_level"), session["score"])
+            interval = next_interval(data.get("repetition_interval", 1), session["score"])
+            next_review = now + timedelta(days=interval)
+            writer.update(
+                node.reference,
+                {
+                    "mastery_level": level,
+                    "last_reviewed": now,
+                    "next_review": next_review,
+                    "repetition_interval": interval,
+                },
+            )
+            summary_nodes[node.id] = [level, to_timestamp(next_review)]
+            mastery_updates.append((node.id, level))
+
+    if summary_nodes:
+        writer.set(summary_ref(userId), {"nodes": summary_nodes}, merge=True)
+        bump_write_version(userId, "mastery", writer)
+    return writer, mastery_updates
+
+
+def grade_submissions(submissions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Grade quiz sessions and record the results.
+
+    Each submission is {"userId", "planId", "lessonId", "answers": [{"questionId",
+    "answer"}]}. Lessons and progress for the whole batch are read in one
+    get_all, and progress, node mastery and review schedules are written in
+    batched commits, so cost grows per batch rather than per answer.
+
+    Failures are isolated per user: a user whose reads, grading or writes
+    fail gets an error result for each of their sessions, and every other
+    user in the batch is graded as usual.
+    """
+    now = datetime.now()
+    by_user: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for position, submission in enumerate(submissions):
+        by_user.setdefault(submission["userId"], []).append((position, submission))
+
+    try:
+        documents = _read_documents(submissions)
+        read_failed = False
+    except Exception as e:
+        print(f"Error reading {len(submissions)} quiz sessions, retrying per user: {e}")
+        documents, read_failed = {}, True
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(submissions)
+    errors: Dict[str, Exception] = {}
+    writes: Dict[str, List[tuple]] = {}
+    mastery_updates: Dict[str, List[Tuple[str, int]]] = {}
+    for userId, user_submissions in by_user.items():
+        try:
+            user_documents = documents
+            if read_failed or any(
+                ("lesson", userId, submission["planId"], submission["lessonId"])
+                not in documents
+                for _, submission in user_submissions
+            ):
+                user_documents = _read_user_documents(
+                    userId, [submission for _, submission in user_submissions]
+                )
+            writer, updates = _grade_user(
+                userId, user_submissions, user_documents, results, now
+            )
+        except Exception as e:
+            errors[userId] = e
+            continue
+        if writer.operations:
+            writes[userId] = writer.operations
+        mastery_updates[userId] = updates
+
+    errors.update(commit_per_user(writes))
+
+    for userId, user_submissions in by_user.items():
+        if userId in errors:
+            print(f"Error grading quiz sessions for user {userId}: {errors[userId]}")
+            for position, submission in user_submissions:
+                ids = (userId, submission["planId"], submission["lessonId"])
+                results[position] = {**_result_ids(ids), "error": "Grading failed"}
+            continue
+        if mastery_updates[userId]:
+            learning_path.update_mastery(userId, mastery_updates[userId])
+        for planId in {submission["planId"] for _, submission in user_submissions}:
+            touch_lesson_plan(userId, planId)
+    return results
+
+
+def _result_ids(ids: Tuple[str, str, str]) -> Dict[str, str]:
+    userId, planId, lessonId = ids
+    return {"userId": userId, "planId": planId, "lessonId": lessonId}
+
+
+class GradingBatcher:
+    """
+    Collects quiz sessions submitted at about the same time, across users,
+    and grades them with a single grade_submissions() call.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW_SECONDS, max_batch: int = MAX_BATCH_SIZE):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, submissions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Queue quiz sessions and wait for their per-session results."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for submission in submissions:
+            future = loop.create_future()
+            self._pending.append((submission, future))
+            futures.append(future)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        # A disconnecting caller must not cancel sessions already being graded
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.to_thread(
+                grade_submissions, [submission for submission, _ in pending]
+            )
+        except Exception as e:
+            print(f"Error grading {len(pending)} quiz sessions: {e}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Results are already committed, so only callers still waiting get them
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,268 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from data.utils import db, get_knowledge_edges, get_knowledge_nodes, on_knowledge_graph_write
+
+FULL_ITERATIONS = 120
+WARM_ITERATIONS = 25
+
+# Warm starts are only used when few nodes are new relative to the cached layout
+MAX_WARM_START_CHANGE = 0.25
+
+# Rows per block in the repulsion pass, bounds memory to BLOCK_SIZE * n * 2 floats
+BLOCK_SIZE = 512
+
+# Larger graphs repel against a random sample of this many nodes per iteration,
+# scaled up to the full count, instead of every pair
+REPULSION_SAMPLE = 256
+
+
+def graph_version(concept_ids: List[str], edge_pairs: List[tuple]) -> str:
+    """Hash the node and edge structure so layouts can be cached per version."""
+    digest = hashlib.sha1()
+    for concept_id in sorted(concept_ids):
+        digest.update(concept_id.encode("utf-8") + b"\0")
+    digest.update(b"\1")
+    for source, target in sorted(edge_pairs):
+        digest.update(f"{source}\0{target}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def force_directed_layout(
+    n: int,
+    edges: np.ndarray,
+    positions: Optional[np.ndarray] = None,
+    iterations: int = FULL_ITERATIONS,
+    temperature: float = 0.1,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Fruchterman-Reingold layout in the unit square.
+
+    edges is an (m, 2) integer array of node indices. positions, when given,
+    is an (n, 2) warm start and iterations/temperature should be lowered.
+    Above REPULSION_SAMPLE nodes the repulsion is estimated from a sample,
+    which keeps each iteration O(n * REPULSION_SAMPLE).
+    """
+    if n == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2)) if positions is None else positions.astype(float).copy()
+    if n == 1:
+        return np.full((1, 2), 0.5)
+
+    k = np.sqrt(1.0 / n)
+    source, target = (edges[:, 0], edges[:, 1]) if len(edges) else (None, None)
+
+    for step in range(iterations):
+        displacement = np.zeros((n, 2))
+
+        # Repulsion between every pair: k^2 / d along the separating vector
+        if n > REPULSION_SAMPLE:
+            others = pos[rng.choice(n, REPULSION_SAMPLE, replace=False)]
+            strength = k * k * n / REPULSION_SAMPLE
+        else:
+            others, strength = pos, k * k
+        for start in range(0, n, BLOCK_SIZE):
+            block = pos[start : start + BLOCK_SIZE]
+            delta = block[:, None, :] - others[None, :, :]
+            dist2 = np.einsum("ijk,ijk->ij", delta, delta)
+            np.maximum(dist2, 1e-9, out=dist2)
+            displacement[start : start + BLOCK_SIZE] += np.einsum(
+                "ijk,ij->ik", delta, strength / dist2
+            )
+
+        # Attraction along edges: d^2 / k, applied to both endpoints
+        if source is not None:
+            delta = pos[source] - pos[target]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+            pull = delta * (dist / k)[:, None]
+            np.subtract.at(displacement, source, pull)
+            np.add.at(displacement, target, pull)
+
+        # Move at most the current temperature, cooling linearly
+        length = np.sqrt(np.einsum("ij,ij->i", displacement, displacement))
+        np.maximum(length, 1e-9, out=length)
+        limit = temperature * (1 - step / iterations)
+        pos += displacement * (np.minimum(length, limit) / length)[:, None]
+
+    # Normalize into the unit square for the client
+    pos -= pos.min(axis=0)
+    span = pos.max(axis=0)
+    span[span == 0] = 1
+    return pos / span
+
+
+class GraphLayoutCache:
+    """
+    Per-user node positions cached by graph version.
+    Path: /users/{userId}/knowledgeGraph/layout
+
+    Changed graphs are laid out again starting from the previous positions.
+    Only one layout per user is computed at a time, concurrent callers wait
+    for it and reuse the result.
+    """
+
+    def __init__(self):
+        self._layouts: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, Event] = {}
+        self._lock = Lock()
+
+    def get_layout(
+        self, userId: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        concept_ids = [str(node["concept_id"]) for node in nodes]
+        index = {concept_id: i for i, concept_id in enumerate(concept_ids)}
+        pairs = [
+            (str(edge["source_concept_id"]), str(edge["target_concept_id"]))
+            for edge in edges
+            if str(edge.get("source_concept_id")) in index
+            and str(edge.get("target_concept_id")) in index
+        ]
+        version = graph_version(concept_ids, pairs)
+
+        while True:
+            previous = self._cached(userId)
+            if previous is not None and previous["version"] == version:
+                return previous
+            with self._lock:
+                running = self._running.get(userId)
+                if running is None:
+                    self._running[userId] = Event()
+                    break
+            running.wait()
+
+        try:
+            return self._compute(userId, concept_ids, index, pairs, version, previous)
+        finally:
+            with self._lock:
+                self._running.pop(userId).set()
+
+    def _compute(
+        self,
+        userId: str,
+        concept_ids: List[str],
+        index: Dict[str, int],
+        pairs: List[tuple],
+        version: str,
+        previous: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        edge_array = np.array(
+            [(index[source], index[target]) for source, target in pairs], dtype=int
+        ).reshape(-1, 2)
+        seed = int(version[:8], 16)
+        start = self._warm_start(previous, concept_ids, edge_array, seed)
+        if start is None:
+            positions = force_directed_layout(len(concept_ids), edge_array, seed=seed)
+        else:
+            positions = force_directed_layout(
+                len(concept_ids),
+                edge_array,
+                positions=start,
+                iterations=WARM_ITERATIONS,
+                temperature=0.02,
+                seed=seed,
+            )
+
+        layout = {
+            "version": version,
+            "positions": {
+                concept_id: [round(float(x), 5), round(float(y), 5)]
+                for concept_id, (x, y) in zip(concept_ids, positions)
+            },
+        }
+        with self._lock:
+            self._layouts[userId] = layout
+        self._layout_ref(userId).set(layout)
+        return layout
+
+    def _cached(self, userId: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            layout = self._layouts.get(userId)
+        if layout is not None:
+            return layout
+        snapshot = self._layout_ref(userId).get()
+        if not snapshot.exists:
+            return None
+        layout = snapshot.to_dict()
+        with self._lock:
+            self._layouts[userId] = layout
+        return layout
+
+    def _warm_start(
+        self,
+        previous: Optional[Dict[str, Any]],
+        concept_ids: List[str],
+        edges: np.ndarray,
+        seed: int,
+    ) -> Optional[np.ndarray]:
+        if previous is None:
+            return None
+        old = previous["positions"]
+        known = np.array([concept_id in old for concept_id in concept_ids], dtype=bool)
+        if not len(concept_ids) or (~known).mean() > MAX_WARM_START_CHANGE:
+            return None
+
+        rng = np.random.default_rng(seed)
+        start = np.array(
+            [old.get(concept_id, (0.5, 0.5)) for concept_id in concept_ids], dtype=float
+        )
+        # Place new nodes next to the centroid of their already placed neighbours
+        for i in np.flatnonzero(~known):
+            neighbours = np.concatenate(
+                [edges[edges[:, 0] == i, 1], edges[edges[:, 1] == i, 0]]
+            )
+            neighbours = neighbours[known[neighbours]]
+            if len(neighbours):
+                start[i] = start[neighbours].mean(axis=0)
+            start[i] += rng.normal(scale=0.02, size=2)
+        return start
+
+    @staticmethod
+    def _layout_ref(userId: str):
+        userdb = db.collection("users").document(userId)
+        return userdb.collection("knowledgeGraph").document("layout")
+
+
+layout_cache = GraphLayoutCache()
+
+# Layouts are refreshed off the request path after graph writes
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="graph-layout")
+_refresh_queued = set()
+_refresh_lock = Lock()
+
+
+def refresh_layout(userId: str):
+    with _refresh_lock:
+        _refresh_queued.discard(userId)
+    try:
+        layout_cache.get_layout(userId, get_knowledge_nodes(userId), get_knowledge_edges(userId))
+    except Exception as e:
+        print(f"Error refreshing graph layout for user {userId}: {e}")
+
+
+@on_knowledge_graph_write
+def _schedule_layout(userId, nodes, edges):
+    # Writes that arrive before a queued refresh starts are covered by it
+    with _refresh_lock:
+        if userId in _refresh_queued:
+            return
+        _refresh_queued.add(userId)
+    _refresh_pool.submit(refresh_layout, userId)
+
+
+def get_graph_with_layout(userId: str) -> Dict[str, Any]:
+    """Load a user's knowledge graph together with cached node positions."""
+    nodes = get_knowledge_nodes(userId)
+    edges = get_knowledge_edges(userId)
+    layout = layout_cache.get_layout(userId, nodes, edges)
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "layoutVersion": layout["version"],
+        "positions": layout["positions"],
+    }
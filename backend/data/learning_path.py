@@ -0,0 +1,258 @@
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from data.model import RelationshipType
+from data.utils import (
+    advance_write_version,
+    get_knowledge_edges,
+    get_knowledge_nodes,
+    get_write_versions,
+    on_knowledge_graph_write,
+)
+
+# Concepts at or above this mastery level count as learned
+MASTERY_THRESHOLD = 80
+
+# A cached graph is reloaded when these write counters moved without it
+GRAPH_KINDS = ("graph", "mastery")
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _mastery(value: Any) -> int:
+    try:
+        return max(0, min(100, int(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class LearningPathGraph:
+    """
+    In-memory prerequisite graph for one user.
+
+    Keeps the transitive closure of PREREQUISITE_FOR edges as bitsets so that
+    "what next" and "path to X" are answered without walking Firestore, and
+    updates the closure incrementally as edges are added.
+    """
+
+    def __init__(self, mastery_threshold: int = MASTERY_THRESHOLD):
+        self.mastery_threshold = mastery_threshold
+        self.index: Dict[str, int] = {}
+        self.concept_ids: List[str] = []
+        self.names: List[str] = []
+        self.mastery: List[int] = []
+        self.ancestors: List[int] = []
+        self.descendants: List[int] = []
+        self.mastered_mask = 0
+        self._order: Optional[List[int]] = None
+        # Write counters the graph reflects, set by the cache that loaded it
+        self.version: Tuple[int, ...] = ()
+        self.lock = Lock()
+
+    @classmethod
+    def from_documents(
+        cls, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], **kwargs
+    ) -> "LearningPathGraph":
+        graph = cls(**kwargs)
+        for node in nodes:
+            graph.upsert_node(node)
+        for edge in edges:
+            graph.add_edge_document(edge)
+        return graph
+
+    def upsert_node(self, node: Dict[str, Any]) -> int:
+        """Add a node or refresh its name and mastery level."""
+        concept_id = str(node["concept_id"])
+        i = self._ensure(concept_id)
+        if node.get("name"):
+            self.names[i] = node["name"]
+        if "mastery_level" in node:
+            self.set_mastery(concept_id, node["mastery_level"])
+        return i
+
+    def set_mastery(self, concept_id: str, level: Any) -> None:
+        i = self._ensure(str(concept_id))
+        self.mastery[i] = _mastery(level)
+        if self.mastery[i] >= self.mastery_threshold:
+            self.mastered_mask |= 1 << i
+        else:
+            self.mastered_mask &= ~(1 << i)
+
+    def add_edge_document(self, edge: Dict[str, Any]) -> bool:
+        """Add an edge document, ignoring non-prerequisite and cyclic edges."""
+        if edge.get("relationship_type") != RelationshipType.PREREQUISITE_FOR.value:
+            return False
+        try:
+            self.add_prerequisite(
+                str(edge["source_concept_id"]), str(edge["target_concept_id"])
+            )
+        except ValueError as e:
+            print(f"Skipping prerequisite edge {edge.get('edge_id')}: {e}")
+            return False
+        return True
+
+    def add_prerequisite(self, source_id: str, target_id: str) -> None:
+        """Record that source is a prerequisite for target."""
+        u = self._ensure(source_id)
+        v = self._ensure(target_id)
+        if u == v or (self.ancestors[u] >> v) & 1:
+            raise ValueError(f"'{source_id}' -> '{target_id}' would create a cycle")
+        if (self.ancestors[v] >> u) & 1:
+            return
+
+        above = self.ancestors[u] | (1 << u)
+        below = self.descendants[v] | (1 << v)
+        for x in _bits(below):
+            self.ancestors[x] |= above
+        for y in _bits(above):
+            self.descendants[y] |= below
+        self._order = None
+
+    def topological_order(self) -> List[int]:
+        # A strict ancestor always has strictly fewer ancestors of its own,
+        # so sorting by ancestor count is a valid topological order.
+        if self._order is None:
+            self._order = sorted(
+                range(len(self.concept_ids)),
+                key=lambda i: (self.ancestors[i].bit_count(), i),
+            )
+        return self._order
+
+    def next_concepts(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Unlearned concepts whose prerequisites are all learned, ranked by how
+        many unlearned concepts they lead to and then by current mastery.
+        """
+        unmastered = ~self.mastered_mask
+        ready = [
+            i
+            for i in range(len(self.concept_ids))
+            if not (self.mastered_mask >> i) & 1
+            and not self.ancestors[i] & unmastered
+        ]
+        ready.sort(
+            key=lambda i: (
+                -(self.descendants[i] & unmastered).bit_count(),
+                -self.mastery[i],
+                i,
+            )
+        )
+        return [
+            {
+                **self._describe(i),
+                "unlocks": (self.descendants[i] & unmastered).bit_count(),
+            }
+            for i in ready[:limit]
+        ]
+
+    def path_to(self, target_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The unlearned prerequisites of a target (and the target itself) in
+        study order, with the mastery still missing along the way.
+        """
+        t = self.index.get(str(target_id))
+        if t is None:
+            return None
+        needed = (self.ancestors[t] | (1 << t)) & ~self.mastered_mask
+        steps = [self._describe(i) for i in self.topological_order() if (needed >> i) & 1]
+        return {
+            "target": self._describe(t),
+            "steps": steps,
+            "remaining_mastery": sum(100 - step["mastery_level"] for step in steps),
+        }
+
+    def _describe(self, i: int) -> Dict[str, Any]:
+        return {
+            "concept_id": self.concept_ids[i],
+            "name": self.names[i],
+            "mastery_level": self.mastery[i],
+        }
+
+    def _ensure(self, concept_id: str) -> int:
+        i = self.index.get(concept_id)
+        if i is None:
+            i = len(self.concept_ids)
+            self.index[concept_id] = i
+            self.concept_ids.append(concept_id)
+            self.names.append(concept_id)
+            self.mastery.append(0)
+            self.ancestors.append(0)
+            self.descendants.append(0)
+            self._order = None
+        return i
+
+
+_graphs: Dict[str, LearningPathGraph] = {}
+_graphs_lock = Lock()
+
+
+def get_learning_graph(userId: str) -> LearningPathGraph:
+    """Return the cached prerequisite graph for a user, reloading it after missed writes."""
+    version = get_write_versions(userId, GRAPH_KINDS)
+    with _graphs_lock:
+        graph = _graphs.get(userId)
+    if graph is not None and graph.version == version:
+        return graph
+
+    graph = LearningPathGraph.from_documents(
+        get_knowledge_nodes(userId), get_knowledge_edges(userId)
+    )
+    graph.version = version
+    with _graphs_lock:
+        cached = _graphs.get(userId)
+        if cached is None or cached.version != version:
+            _graphs[userId] = graph
+        return _graphs[userId]
+
+
+def next_concepts(userId: str, limit: int = 5) -> List[Dict[str, Any]]:
+    graph = get_learning_graph(userId)
+    with graph.lock:
+        return graph.next_concepts(limit)
+
+
+def path_to_concept(userId: str, concept_id: str) -> Optional[Dict[str, Any]]:
+    graph = get_learning_graph(userId)
+    with graph.lock:
+        return graph.path_to(concept_id)
+
+
+def update_mastery(userId: str, levels: List[Tuple[str, int]]) -> None:
+    """Refresh cached mastery levels after this worker wrote them to Firestore."""
+    with _graphs_lock:
+        graph = _graphs.get(userId)
+    if graph is None:
+        return
+    with graph.lock:
+        for concept_id, level in levels:
+            graph.set_mastery(concept_id, level)
+    _advance(userId, graph, "mastery")
+
+
+@on_knowledge_graph_write
+def _apply_graph_write(userId, nodes, edges):
+    with _graphs_lock:
+        graph = _graphs.get(userId)
+    # Users that are not cached yet are loaded from Firestore on first query
+    if graph is None:
+        return
+    with graph.lock:
+        for node in nodes:
+            graph.upsert_node(node)
+        for edge in edges:
+            graph.add_edge_document(edge)
+    _advance(userId, graph, "graph")
+
+
+def _advance(userId: str, graph: LearningPathGraph, kind: str) -> None:
+    # A graph that was current stays current after applying this worker's write
+    current = get_write_versions(userId, GRAPH_KINDS)
+    with graph.lock:
+        version = advance_write_version(graph.version, current, GRAPH_KINDS, kind)
+        if version is not None:
+            graph.version = version
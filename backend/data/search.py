@@ -0,0 +1,260 @@
+import json
+import os
+import re
+import sqlite3
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from data.utils import (
+    advance_write_version,
+    db,
+    get_knowledge_nodes,
+    get_lessons,
+    get_write_versions,
+    on_knowledge_graph_write,
+    on_lesson_plan_write,
+)
+
+# Defaults to an in-process index that is rebuilt per user on first search
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", ":memory:")
+SNIPPET_TOKENS = 16
+# A user's index is rebuilt when these write counters moved without it
+INDEXED_KINDS = ("lessons", "graph")
+
+# bm25 column weights: user_id, kind, doc_id, plan_id, title, body
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+
+class SearchIndex:
+    """
+    Per-user full-text index over lessons and knowledge nodes in SQLite FTS5.
+
+    Users are backfilled from Firestore on their first search and kept
+    current through the data layer's write listeners.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+                    user_id UNINDEXED, kind UNINDEXED, doc_id UNINDEXED,
+                    plan_id UNINDEXED, title, body,
+                    tokenize = 'porter unicode61'
+                )"""
+            )
+            indexed_columns = [
+                row[1] for row in self.conn.execute("PRAGMA table_info(indexed_users)")
+            ]
+            migrating = not {"indexed_at", "version"} & set(indexed_columns)
+            # Maps a document's identity to its FTS rowid, so replacing or
+            # removing it is a key lookup instead of a scan of the FTS table
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS document_rows (
+                    user_id TEXT, kind TEXT, plan_id TEXT, doc_id TEXT,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, kind, plan_id, doc_id)
+                ) WITHOUT ROWID"""
+            )
+            if migrating:
+                # Indexes built before the row mapping may hold colliding
+                # lessons, so they are dropped and backfilled again on search
+                self.conn.execute("DELETE FROM documents")
+                self.conn.execute("DELETE FROM document_rows")
+            if "version" not in indexed_columns:
+                # Users indexed by time are backfilled again on their next search
+                self.conn.execute("DROP TABLE IF EXISTS indexed_users")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS indexed_users (
+                    user_id TEXT PRIMARY KEY, version TEXT NOT NULL
+                )"""
+            )
+
+    def upsert(
+        self, userId: str, kind: str, docId: str, planId: str, title: str, body: str
+    ) -> None:
+        with self.lock, self.conn:
+            self._delete(userId, kind, planId, docId)
+            row = self.conn.execute(
+                "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                (userId, kind, docId, planId, title, body),
+            ).lastrowid
+            self.conn.execute(
+                "INSERT INTO document_rows VALUES (?, ?, ?, ?, ?)",
+                (userId, kind, planId, docId, row),
+            )
+
+    def remove(self, userId: str, kind: str, planId: str, docId: str) -> None:
+        with self.lock, self.conn:
+            self._delete(userId, kind, planId, docId)
+
+    def indexed_version(self, userId: str) -> Optional[Tuple[int, ...]]:
+        """Write counters the user's index reflects, None if not indexed."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT version FROM indexed_users WHERE user_id = ?", (userId,)
+            ).fetchone()
+        return None if row is None else tuple(json.loads(row[0]))
+
+    def mark_indexed(self, userId: str, version: Tuple[int, ...]) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO indexed_users VALUES (?, ?)",
+                (userId, json.dumps(list(version))),
+            )
+
+    def clear_user(self, userId: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                """DELETE FROM documents WHERE rowid IN
+                    (SELECT row FROM document_rows WHERE user_id = ?)""",
+                (userId,),
+            )
+            self.conn.execute("DELETE FROM document_rows WHERE user_id = ?", (userId,))
+
+    def search(
+        self, userId: str, query: str, page: int = 1, page_size: int = 10
+    ) -> Dict[str, Any]:
+        match = to_match_expression(query)
+        if not match:
+            return {"total": 0, "page": page, "pageSize": page_size, "results": []}
+
+        with self.lock:
+            total = self.conn.execute(
+                "SELECT count(*) FROM documents WHERE documents MATCH ? AND user_id = ?",
+                (match, userId),
+            ).fetchone()[0]
+            rows = self.conn.execute(
+                f"""SELECT kind, doc_id, plan_id, title,
+                        snippet(documents, 5, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}),
+                        bm25(documents, 0, 0, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+                    FROM documents
+                    WHERE documents MATCH ? AND user_id = ?
+                    ORDER BY score
+                    LIMIT ? OFFSET ?""",
+                (match, userId, page_size, (page - 1) * page_size),
+            ).fetchall()
+
+        results = [
+            {
+                "kind": kind,
+                "id": docId,
+                "planId": planId or None,
+                "title": title,
+                "snippet": snippet,
+                # bm25 is lower-is-better, flip it for clients
+                "score": round(-score, 4),
+            }
+            for kind, docId, planId, title, snippet, score in rows
+        ]
+        return {"total": total, "page": page, "pageSize": page_size, "results": results}
+
+    def _delete(self, userId: str, kind: str, planId: str, docId: str) -> None:
+        # Lesson ids are only unique within a plan, so the plan is part of the key
+        key = (userId, kind, planId, docId)
+        found = self.conn.execute(
+            """SELECT row FROM document_rows
+                WHERE user_id = ? AND kind = ? AND plan_id = ? AND doc_id = ?""",
+            key,
+        ).fetchone()
+        if found is None:
+            return
+        self.conn.execute("DELETE FROM documents WHERE rowid = ?", found)
+        self.conn.execute(
+            """DELETE FROM document_rows
+                WHERE user_id = ? AND kind = ? AND plan_id = ? AND doc_id = ?""",
+            key,
+        )
+
+
+def to_match_expression(query: str) -> str:
+    """
+    Turn free text into an FTS5 expression: every word must match and the
+    last word also matches as a prefix, so results show up while typing.
+    """
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _lesson_body(lesson: Dict[str, Any]) -> str:
+    objectives = lesson.get("objectives") or []
+    if isinstance(objectives, str):
+        objectives = [objectives]
+    return "\n".join([*objectives, lesson.get("content") or ""])
+
+
+search_index = SearchIndex()
+
+
+def index_lesson(userId: str, planId: str, lesson: Dict[str, Any]) -> None:
+    search_index.upsert(
+        userId,
+        "lesson",
+        str(lesson["lesson_id"]),
+        planId,
+        lesson.get("title", ""),
+        _lesson_body(lesson),
+    )
+
+
+def index_node(userId: str, node: Dict[str, Any]) -> None:
+    search_index.upsert(
+        userId,
+        "concept",
+        str(node["concept_id"]),
+        "",
+        node.get("name", ""),
+        node.get("description", ""),
+    )
+
+
+def ensure_indexed(userId: str) -> None:
+    """Backfill a user's lessons and concepts on first search and after writes this worker missed."""
+    version = get_write_versions(userId, INDEXED_KINDS)
+    if search_index.indexed_version(userId) == version:
+        return
+    search_index.clear_user(userId)
+    plans = db.collection("users").document(userId).collection("lessonPlans")
+    for plan in plans.list_documents():
+        for lesson in get_lessons(userId, plan.id):
+            index_lesson(userId, plan.id, lesson)
+    for node in get_knowledge_nodes(userId):
+        index_node(userId, node)
+    search_index.mark_indexed(userId, version)
+
+
+def search(userId: str, query: str, page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+    ensure_indexed(userId)
+    return search_index.search(userId, query, page, page_size)
+
+
+def _advance_index(userId: str, kind: str) -> None:
+    # An index that was current stays current after applying this worker's write
+    cached = search_index.indexed_version(userId)
+    if cached is None:
+        return
+    version = advance_write_version(
+        cached, get_write_versions(userId, INDEXED_KINDS), INDEXED_KINDS, kind
+    )
+    if version is not None:
+        search_index.mark_indexed(userId, version)
+
+
+@on_lesson_plan_write
+def _index_lesson_plan(userId, lesson_plan):
+    for lesson in lesson_plan["lessons"]:
+        index_lesson(userId, lesson_plan["plan_id"], lesson)
+    _advance_index(userId, "lessons")
+
+
+@on_knowledge_graph_write
+def _index_nodes(userId, nodes, edges):
+    for node in nodes:
+        index_node(userId, node)
+    _advance_index(userId, "graph")
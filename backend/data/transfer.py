@@ -0,0 +1,218 @@
+"""
+Streaming export and import of whole users for backups, migrations and seeding.
+
+Every document under /users/{userId} is written as one record, together with
+the shared lessonContent bodies its lessons reference. Records are streamed
+one at a time, so memory stays flat no matter how large a user is.
+
+    python -m data.transfer export --out users.ndjson [--user aturing]
+    python -m data.transfer import --in users.ndjson
+
+Both directions checkpoint after every user and resume from the checkpoint
+when run again with the same --checkpoint file.
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from data.archive import decode_document, encode_document, read_snapshot
+from data.utils import db
+
+try:
+    import msgpack
+except ImportError:  # NDJSON works without it
+    msgpack = None
+
+
+def _require_msgpack():
+    if msgpack is None:
+        raise RuntimeError("msgpack is required for --format msgpack")
+
+
+def _pack_default(value: Any) -> Any:
+    # Packer(datetime=True) only takes aware datetime instances, not Firestore's
+    # DatetimeWithNanoseconds or naive values, which Firestore stores as UTC
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class RecordWriter:
+    def __init__(self, f: BinaryIO, fmt: str):
+        self.f = f
+        self.fmt = fmt
+        if fmt == "msgpack":
+            _require_msgpack()
+            self.packer = msgpack.Packer(datetime=True, default=_pack_default)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.fmt == "msgpack":
+            # msgpack carries bytes and timestamps natively
+            self.f.write(self.packer.pack(record))
+        else:
+            self.f.write(json.dumps(encode_document(record)).encode("utf-8") + b"\n")
+
+
+def read_records(f: BinaryIO, fmt: str) -> Iterator[tuple]:
+    """Yield (record, offset after the record) pairs from a stream."""
+    if fmt == "msgpack":
+        _require_msgpack()
+        unpacker = msgpack.Unpacker(f, timestamp=3, raw=False)
+        start = f.tell()
+        for record in unpacker:
+            yield record, start + unpacker.tell()
+    else:
+        for line in iter(f.readline, b""):
+            if line.strip():
+                yield decode_document(json.loads(line)), f.tell()
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, Any]:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_checkpoint(path: Optional[str], checkpoint: Dict[str, Any]) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def _export_tree(doc_ref, writer: RecordWriter, content_refs: set) -> int:
+    """Write a document and everything below it, collecting content hashes."""
+    count = 0
+    snapshot = doc_ref.get()
+    if snapshot.exists:
+        data = snapshot.to_dict()
+        writer.write({"type": "doc", "path": doc_ref.path, "data": data})
+        count += 1
+        if "content_ref" in data:
+            content_refs.add(data["content_ref"])
+        if doc_ref.parent.id == "archivedPlans":
+            # Archived lessons are inside the compressed snapshot
+            snapshot = read_snapshot(doc_ref, data)
+            content_refs.update(
+                lesson["content_ref"]
+                for lesson in snapshot["lessons"].values()
+                if lesson.get("content_ref")
+            )
+    for collection in doc_ref.collections():
+        for child in collection.list_documents():
+            count += _export_tree(child, writer, content_refs)
+    return count
+
+
+def export_user(userId: str, writer: RecordWriter) -> int:
+    content_refs: set = set()
+    count = _export_tree(db.collection("users").document(userId), writer, content_refs)
+    content = db.collection("lessonContent")
+    for digest in sorted(content_refs):
+        count += _export_tree(content.document(digest), writer, set())
+    writer.write({"type": "user_end", "userId": userId})
+    return count
+
+
+def export_users(
+    out_path: str,
+    userId: Optional[str] = None,
+    fmt: str = "ndjson",
+    checkpoint_path: Optional[str] = None,
+) -> int:
+    """Export one user or every user, resuming after the last finished user."""
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint and (
+        not os.path.exists(out_path) or os.path.getsize(out_path) < checkpoint["offset"]
+    ):
+        # Resuming would pad the missing records with NULs, start over instead
+        print(f"Ignoring checkpoint, {out_path} is missing or shorter than recorded")
+        checkpoint = {}
+    mode = "r+b" if checkpoint else "wb"
+    with open(out_path, mode) as f:
+        if checkpoint:
+            # Drop whatever was written for a user that did not finish
+            f.truncate(checkpoint["offset"])
+            f.seek(checkpoint["offset"])
+        writer = RecordWriter(f, fmt)
+
+        done = checkpoint.get("userId", "")
+        if userId:
+            users = [] if userId == done else [userId]
+        else:
+            # list_documents also returns users that only have subcollections,
+            # paged in document id order
+            users = (
+                user.id
+                for user in db.collection("users").list_documents()
+                if user.id > done
+            )
+
+        exported = 0
+        for user in users:
+            exported += export_user(user, writer)
+            f.flush()
+            save_checkpoint(checkpoint_path, {"userId": user, "offset": f.tell()})
+            print(f"Exported user {user}")
+    return exported
+
+
+def import_users(
+    in_path: str, fmt: str = "ndjson", checkpoint_path: Optional[str] = None
+) -> int:
+    """Import records with a BulkWriter, which batches and commits in parallel."""
+    checkpoint = load_checkpoint(checkpoint_path)
+    bulk_writer = db.bulk_writer()
+    imported = 0
+    with open(in_path, "rb") as f:
+        f.seek(checkpoint.get("offset", 0))
+        for record, offset in read_records(f, fmt):
+            if record["type"] == "doc":
+                bulk_writer.set(db.document(record["path"]), record["data"])
+                imported += 1
+            elif record["type"] == "user_end":
+                bulk_writer.flush()
+                save_checkpoint(
+                    checkpoint_path, {"userId": record["userId"], "offset": offset}
+                )
+                print(f"Imported user {record['userId']}")
+    bulk_writer.close()
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("--out", required=True)
+    export_parser.add_argument("--user", help="export a single user")
+
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("--in", dest="in_path", required=True)
+
+    for command in (export_parser, import_parser):
+        command.add_argument("--format", choices=["ndjson", "msgpack"], default="ndjson")
+        command.add_argument("--checkpoint", help="file to record progress in and resume from")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        count = export_users(args.out, args.user, args.format, args.checkpoint)
+        print(f"Exported {count} documents")
+    else:
+        count = import_users(args.in_path, args.format, args.checkpoint)
+        print(f"Imported {count} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 import os
+import time
+from datetime import datetime
+from threading import Lock
+
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
-from pydantic_core import from_json
+from google.api_core.exceptions import NotFound
 
+from data.content_store import ContentStore, make_preview
+from data.generation import (
+    GeneratedKnowledgeGraph,
+    GeneratedLessonPlan,
+    extract_json,
+    repair_output,
+)
 from data.model import (
     KnowledgeGraph,
     LessonPlan,
@@ -16,33 +27,113 @@ from dotenv import load_dotenv
 
 load_dotenv("./backend/.env")
 
-fbpath = os.environ["FIRESTORE_PATH"]
-cred = credentials.Certificate(fbpath)
 
-app = firebase_admin.initialize_app(cred)
+def firebase_credentials():
+    """A service account key file from FIRESTORE_PATH, or the FIREBASE_* env vars."""
+    if os.getenv("FIRESTORE_PATH"):
+        return credentials.Certificate(os.environ["FIRESTORE_PATH"])
+    client_email = os.environ["FIREBASE_CLIENT_EMAIL"]
+    return credentials.Certificate(
+        {
+            "type": "service_account",
+            "project_id": os.environ["FIREBASE_PROJECT_ID"],
+            "client_email": client_email,
+            "private_key": os.environ["FIREBASE_PRIVATE_KEY"].replace("\\n", "\n"),
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{client_email}",
+        }
+    )
+
+
+class LazyClient:
+    """
+    Stands in for a client that is created on first use, so importing the
+    data layer needs no credentials and the app factory decides when to
+    connect.
+    """
+
+    def __init__(self, create):
+        self._create = create
+        self._instance = None
+        self._lock = Lock()
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._create()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def _firestore_client():
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(firebase_credentials())
+    return firestore.client()
 
-db = firestore.client()
 
-users_ref = db.collection("users")
+# The one Firebase app and Firestore client every module in the process shares
+db = LazyClient(_firestore_client)
+
+content_store = ContentStore(LazyClient(lambda: db.collection("lessonContent")))
+
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+
+def commit_in_batches(operations):
+    """
+    Apply ("set", ref, data[, merge]), ("update", ref, data) and
+    ("delete", ref) operations in as few batched commits as fit.
+    """
+    for start in range(0, len(operations), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for operation in operations[start : start + MAX_BATCH_WRITES]:
+            if operation[0] == "set":
+                merge = operation[3] if len(operation) > 3 else False
+                batch.set(operation[1], operation[2], merge=merge)
+            elif operation[0] == "update":
+                batch.update(operation[1], operation[2])
+            else:
+                batch.delete(operation[1])
+        batch.commit()
+
+
+def init_firestore():
+    """Create the Firebase app and Firestore client now rather than on first use."""
+    db.get()
 
 
 def write_user(UserProfile: UserProfile):
-    users_ref.document(UserProfile.uid).set(UserProfile.to_firestore_dict())
+    db.collection("users").document(UserProfile.uid).set(UserProfile.to_firestore_dict())
 
 
 def read_user_profile(userId):
-    user = users_ref.document(userId).get()
+    user = db.collection("users").document(userId).get()
     if user.exists:
         return user
 
 
 def write_lessons_from_artifact(user_artifact: UserArtifact):
     for lesson_plan in user_artifact.lesson_plans:
-        write_lesson_plan(user_artifact.user_id, lesson_plan)
+        write_lesson_plan(
+            user_artifact.user_id,
+            {
+                **lesson_plan.model_dump(),
+                "user_id": user_artifact.user_id,
+                "status": lesson_plan.status.value,
+                "lessons": [lesson.model_dump() for lesson in lesson_plan.lessons],
+            },
+        )
 
 
 def parse_json(model_output):
-    lesson_plan = LessonPlan.model_validate(from_json(model_output, allow_partial=True))
+    lesson_plan, _ = repair_output(model_output, LessonPlan)
     return lesson_plan
 
 
@@ -54,21 +145,131 @@ def get_lesson_plan(userId, planId):
     userdb = db.collection("users").document(userId)
     lessons_ref = userdb.collection("lessonPlans")
     lesson = lessons_ref.document(planId)
-    if lesson.get().exists:
+    if lesson.get().exists or restore_archived_plan(userId, planId):
         return lesson
     else:
         return None
 
 
+# Plans are archived by last_accessed, which user-facing reads record through
+# touch_lesson_plan. Writing it on every read would cost a write per request,
+# so each process records it at most this often
+TOUCH_INTERVAL_SECONDS = int(os.getenv("PLAN_TOUCH_INTERVAL", "3600"))
+MAX_TOUCHED = 10_000
+_touched = {}
+_touched_lock = Lock()
+
+
+def touch_lesson_plan(userId, planId):
+    now = time.monotonic()
+    with _touched_lock:
+        if now - _touched.get((userId, planId), float("-inf")) < TOUCH_INTERVAL_SECONDS:
+            return
+        _touched[(userId, planId)] = now
+        if len(_touched) > MAX_TOUCHED:
+            for key, touched_at in list(_touched.items()):
+                if now - touched_at >= TOUCH_INTERVAL_SECONDS:
+                    del _touched[key]
+    userdb = db.collection("users").document(userId)
+    try:
+        userdb.collection("lessonPlans").document(planId).update(
+            {"last_accessed": datetime.now()}
+        )
+    except NotFound:
+        # Archived in the meantime, the next read rehydrates it
+        with _touched_lock:
+            _touched.pop((userId, planId), None)
+
+
+def restore_archived_plan(userId, planId):
+    # Imported here because data.archive builds on this module
+    from data.archive import rehydrate_lesson_plan
+
+    return rehydrate_lesson_plan(userId, planId)
+
+
+def list_lesson_plans(userId):
+    userdb = db.collection("users").document(userId)
+    return [
+        {"plan_id": plan.id, **plan.to_dict()}
+        for plan in userdb.collection("lessonPlans").stream()
+    ]
+
+
+def summary_ref(userId):
+    userdb = db.collection("users").document(userId)
+    return userdb.collection("summary").document("dashboard")
+
+
+def versions_ref(userId):
+    userdb = db.collection("users").document(userId)
+    return userdb.collection("summary").document("versions")
+
+
+def bump_write_version(userId, kind, writer=None):
+    """
+    Count a write of one kind of a user's data ("lessons", "graph" or
+    "mastery"). Write listeners only run in the worker that wrote, so caches
+    compare these counters on read to notice writes made elsewhere.
+    """
+    data = {kind: firestore.Increment(1)}
+    if writer is None:
+        versions_ref(userId).set(data, merge=True)
+    else:
+        writer.set(versions_ref(userId), data, merge=True)
+
+
+def get_write_versions(userId, kinds):
+    snapshot = versions_ref(userId).get()
+    versions = snapshot.to_dict() if snapshot.exists else {}
+    return tuple(versions.get(kind, 0) for kind in kinds)
+
+
+def advance_write_version(cached, current, kinds, kind):
+    """
+    The version a cache at `cached` is at after applying this worker's own
+    write of `kind`, or None if `current` shows writes it has not seen.
+    """
+    expected = tuple(count + (name == kind) for name, count in zip(kinds, cached))
+    return current if tuple(current) == expected else None
+
+
+def to_timestamp(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return 0.0
+    return float(value or 0)
+
+
+lesson_plan_write_listeners = []
+
+
+def on_lesson_plan_write(callback):
+    lesson_plan_write_listeners.append(callback)
+    return callback
+
+
 def write_lesson_plan(userId, lesson_plan):
+    # Agents pass JSON strings or loosely shaped dicts, repair them locally
+    # rather than failing the tool call and forcing another model round trip.
+    # Repair can fill in a plan_id, so the stored one is returned to the agent
+    original = lesson_plan if isinstance(lesson_plan, dict) else {}
+    generated, _ = repair_output(lesson_plan, GeneratedLessonPlan)
+    lesson_plan = {**original, **generated.model_dump(mode="json")}
+
     userdb = db.collection("users").document(lesson_plan["user_id"])
     lessonplan_ref = userdb.collection("lessonPlans").document(lesson_plan["plan_id"])
     lessonplan_ref.set(
         {
+            "title": lesson_plan["title"],
             "description": lesson_plan["description"],
-            "created_at": lesson_plan["created_at"],
-            "last_accessed": lesson_plan["last_accessed"],
-            "status": lesson_plan["status"],
+            "created_at": lesson_plan.get("created_at") or datetime.now(),
+            "last_accessed": lesson_plan.get("last_accessed") or datetime.now(),
+            "status": lesson_plan.get("status") or "active",
             "source_prompt": lesson_plan["source_prompt"],
         }
     )
@@ -77,12 +278,89 @@ def write_lesson_plan(userId, lesson_plan):
         lessons_ref.document(lesson["lesson_id"]).set(
             {
                 "title": lesson["title"],
-                "objectives": lesson["title"],
-                "content": lesson["content"],
+                "objectives": lesson["objectives"],
+                "content_ref": content_store.put(lesson["content"]),
+                "content_preview": make_preview(lesson["content"]),
                 "external_resources": lesson["external_resources"],
                 "order": lesson["order"],
             }
         )
+    summary_ref(lesson_plan["user_id"]).set(
+        {
+            "plans": {
+                lesson_plan["plan_id"]: {
+                    "lesson_count": len(lesson_plan["lessons"]),
+                    "status": lesson_plan.get("status") or "active",
+                }
+            }
+        },
+        merge=True,
+    )
+    bump_write_version(lesson_plan["user_id"], "lessons")
+    for callback in lesson_plan_write_listeners:
+        try:
+            callback(lesson_plan["user_id"], lesson_plan)
+        except Exception as e:
+            print(f"Error in lesson plan listener {callback.__name__}: {e}")
+    return lesson_plan["plan_id"]
+
+
+def resolve_lesson_content(lesson):
+    if "content_ref" in lesson:
+        lesson["content"] = content_store.get(lesson.pop("content_ref"))
+        lesson.pop("content_preview", None)
+    return lesson
+
+
+def get_lessons(userId, planId):
+    userdb = db.collection("users").document(userId)
+    lessons_ref = (
+        userdb.collection("lessonPlans").document(planId).collection("lessons")
+    )
+    lessons = [
+        resolve_lesson_content({"lesson_id": lesson.id, **lesson.to_dict()})
+        for lesson in lessons_ref.order_by("order").stream()
+    ]
+    if not lessons and restore_archived_plan(userId, planId):
+        return get_lessons(userId, planId)
+    return lessons
+
+
+def write_progress(userId, planId, progress, batch=None):
+    userdb = db.collection("users").document(userId)
+    progress_ref = (
+        userdb.collection("lessonPlans")
+        .document(planId)
+        .collection("progress")
+        .document(progress["lesson_id"])
+    )
+    writer = batch or db.batch()
+    writer.set(
+        progress_ref,
+        {key: value for key, value in progress.items() if key != "lesson_id"},
+        merge=True,
+    )
+    last_accessed = progress.get("last_accessed") or datetime.now()
+    writer.set(
+        summary_ref(userId),
+        {
+            "progress": {
+                planId: {
+                    progress["lesson_id"]: [
+                        progress.get("status", "not_started"),
+                        progress.get("mastery_score", 0),
+                        to_timestamp(last_accessed),
+                    ]
+                }
+            },
+            "activity_days": firestore.ArrayUnion(
+                [datetime.fromtimestamp(to_timestamp(last_accessed)).date().isoformat()]
+            ),
+        },
+        merge=True,
+    )
+    if batch is None:
+        writer.commit()
 
 
 # def write_lesson_plan(userId, lesson_plan: LessonPlan):
@@ -97,7 +375,26 @@ def write_lesson_plan(userId, lesson_plan):
 #     progress_ref.document(progress.lesson_id).set(progress.to_firestore_dict())
 
 
+graph_write_listeners = []
+
+
+def on_knowledge_graph_write(callback):
+    graph_write_listeners.append(callback)
+    return callback
+
+
 def write_knowledge_graph(userId, nodes, edges):
+    nodes = extract_json(nodes) if isinstance(nodes, str) else nodes
+    edges = extract_json(edges) if isinstance(edges, str) else edges
+    graph, _ = repair_output(
+        {"user_id": userId, "nodes": nodes, "edges": edges}, GeneratedKnowledgeGraph
+    )
+    nodes = [
+        {**(original if isinstance(original, dict) else {}), **node.model_dump(mode="json")}
+        for original, node in zip(nodes, graph.nodes)
+    ]
+    edges = [edge.model_dump(mode="json") for edge in graph.edges]
+
     userdb = db.collection("users").document(userId)
     graph_ref = userdb.collection("knowledgeGraph")
     node_holder = graph_ref.document("nodeHolder").collection("nodes")
@@ -108,8 +405,8 @@ def write_knowledge_graph(userId, nodes, edges):
                 "name": node["name"],
                 "description": node["description"],
                 "mastery_level": node["mastery_level"],
-                "last_reviewed": node["last_reviewed"],
-                "next_review": node["next_review"],
+                "last_reviewed": node.get("last_reviewed") or datetime.now(),
+                "next_review": node.get("next_review") or datetime.now(),
                 "source_lesson_id": node["source_lesson_id"],
             }
         )
@@ -121,6 +418,42 @@ def write_knowledge_graph(userId, nodes, edges):
                 "relationship_type": edge["relationship_type"],
             }
         )
+    summary_ref(userId).set(
+        {
+            "nodes": {
+                str(node["concept_id"]): [
+                    node["mastery_level"],
+                    to_timestamp(node.get("next_review") or datetime.now()),
+                ]
+                for node in nodes
+            }
+        },
+        merge=True,
+    )
+    bump_write_version(userId, "graph")
+    for callback in graph_write_listeners:
+        try:
+            callback(userId, nodes, edges)
+        except Exception as e:
+            print(f"Error in knowledge graph listener {callback.__name__}: {e}")
+    return {
+        "concept_ids": [str(node["concept_id"]) for node in nodes],
+        "edge_ids": [str(edge["edge_id"]) for edge in edges],
+    }
+
+
+def get_knowledge_nodes(userId):
+    userdb = db.collection("users").document(userId)
+    graphref = userdb.collection("knowledgeGraph")
+    node_holder = graphref.document("nodeHolder").collection("nodes")
+    return [{"concept_id": node.id, **node.to_dict()} for node in node_holder.stream()]
+
+
+def get_knowledge_edges(userId):
+    userdb = db.collection("users").document(userId)
+    graphref = userdb.collection("knowledgeGraph")
+    edge_holder = graphref.document("edgeHolder").collection("edges")
+    return [{"edge_id": edge.id, **edge.to_dict()} for edge in edge_holder.stream()]
 
 
 def get_knowledge_graph(userId):
@@ -134,8 +467,8 @@ def get_knowledge_graph(userId):
     nodes = node_holder.stream()
     edges = edge_holder.stream()
     graph = {
-        nodes: [{node.id: node.to_dict()} for node in nodes],
-        edges: [{edge.id: edge.to_dict()} for edge in edges],
+        "nodes": [{node.id: node.to_dict()} for node in nodes],
+        "edges": [{edge.id: edge.to_dict()} for edge in edges],
     }
     return graph
 
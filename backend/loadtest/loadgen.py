@@ -0,0 +1,144 @@
+"""
+Open-loop load generator for the main.py API.
+
+Requests are started at a fixed rate regardless of how fast earlier ones
+finish, so queueing inside the server shows up as latency instead of being
+hidden by a closed loop. Latency is measured from each request's scheduled
+start, so time spent waiting for --max-in-flight or a late event loop counts.
+
+The default prompt includes the request number so every request reaches the
+agents instead of replaying from the prompt cache. Prompts are the same
+across runs, record them once with STUB_MODE=record before replaying.
+
+Example:
+    python -m loadtest.loadgen --rps 20 --duration 60 \\
+        --path "/api/user-prompt?userId={user}&prompt=I want to learn {topic} ({i})"
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+TOPICS = ["linear algebra", "react hooks", "graph theory", "statistics", "rust"]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.started = 0
+        self.dropped = 0
+
+    def report(self, elapsed: float) -> Dict[str, object]:
+        latencies = sorted(self.latencies)
+        completed = sum(self.statuses.values()) + sum(self.errors.values())
+        failed = sum(self.errors.values()) + sum(
+            count for status, count in self.statuses.items() if status >= 400
+        )
+        return {
+            "started": self.started,
+            "completed": completed,
+            "dropped": self.dropped,
+            "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(failed / completed, 4) if completed else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50) * 1000, 1),
+                "p95": round(percentile(latencies, 95) * 1000, 1),
+                "p99": round(percentile(latencies, 99) * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            },
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+        }
+
+
+async def fire(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    body: Optional[dict],
+    result: LoadResult,
+    limit: asyncio.Semaphore,
+    scheduled: float,
+):
+    async with limit:
+        try:
+            response = await client.request(method, url, json=body)
+            result.statuses[response.status_code] += 1
+        except httpx.HTTPError as e:
+            result.errors[type(e).__name__] += 1
+        result.latencies.append(time.perf_counter() - scheduled)
+
+
+async def run(args) -> Dict[str, object]:
+    result = LoadResult()
+    users = itertools.cycle([f"loadtest-{i}" for i in range(args.users)])
+    topics = itertools.cycle(TOPICS)
+    limit = asyncio.Semaphore(args.max_in_flight)
+    body_template = json.loads(args.body) if args.body else None
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        tasks = []
+        interval = 1.0 / args.rps
+        start = time.perf_counter()
+        for i in range(int(args.rps * args.duration)):
+            # Sleep until this request's slot so the arrival rate stays fixed
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if limit.locked() and args.drop_when_saturated:
+                result.dropped += 1
+                continue
+            user, topic = next(users), next(topics)
+            url = args.path.format(user=user, topic=topic, i=i)
+            body = None
+            if body_template is not None:
+                body = json.loads(
+                    json.dumps(body_template)
+                    .replace("{user}", user)
+                    .replace("{topic}", topic)
+                    .replace("{i}", str(i))
+                )
+            result.started += 1
+            tasks.append(asyncio.create_task(fire(client, args.method, url, body, result, limit, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return result.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--path", default="/api/user-prompt?userId={user}&prompt=I want to learn {topic} ({i})")
+    parser.add_argument("--body", help="JSON body template, {user}, {topic} and {i} are substituted")
+    parser.add_argument("--rps", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--drop-when-saturated", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
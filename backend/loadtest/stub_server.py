@@ -0,0 +1,250 @@
+"""
+Local OpenAI- and Anthropic-compatible stub for load testing the agent pipeline.
+
+Point the SDKs at it with
+    OPENAI_BASE_URL=http://localhost:8100/v1
+    ANTHROPIC_BASE_URL=http://localhost:8100
+and set KNOWDE_OFFLINE=1 so the researcher does not call Google search.
+
+Modes (STUB_MODE):
+    replay  answer from recorded transcripts, 404 on a miss
+    record  forward to the real APIs and append every exchange to the transcript
+
+With STUB_STRICT=0 replay misses get a synthesized plain text reply instead.
+Those replies carry no tool calls and do not parse as any response_model, so
+the agents fail or retry on them; use them only to load the HTTP and pooling
+layers, not to measure the pipeline.
+
+Run with: python -m loadtest.stub_server
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_MODE = os.getenv("STUB_MODE", "replay")
+TRANSCRIPT_PATH = os.getenv("STUB_TRANSCRIPTS", "./loadtest/transcripts.jsonl")
+# Fail replay misses instead of synthesizing a reply
+STUB_STRICT = os.getenv("STUB_STRICT", "1") == "1"
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "400"))
+TOKENS_PER_SEC = float(os.getenv("STUB_TOKENS_PER_SEC", "80"))
+COMPLETION_TOKENS = int(os.getenv("STUB_COMPLETION_TOKENS", "120"))
+
+UPSTREAMS = {
+    "openai": os.getenv("STUB_OPENAI_UPSTREAM", "https://api.openai.com"),
+    "anthropic": os.getenv("STUB_ANTHROPIC_UPSTREAM", "https://api.anthropic.com"),
+}
+FORWARDED_HEADERS = {"authorization", "x-api-key", "anthropic-version", "anthropic-beta"}
+
+# add_datetime_to_instructions puts the current time in every prompt
+VOLATILE = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?")
+
+
+def request_key(provider: str, body: Dict[str, Any]) -> str:
+    """Hash a request with timestamps masked so recordings replay across runs."""
+    canonical = json.dumps(body, sort_keys=True, default=str)
+    canonical = VOLATILE.sub("<datetime>", canonical)
+    return hashlib.sha256(f"{provider}:{canonical}".encode("utf-8")).hexdigest()
+
+
+class TranscriptStore:
+    """Append-only JSONL transcripts of request key to recorded response."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+transcripts = TranscriptStore(TRANSCRIPT_PATH)
+app = FastAPI(title="LLM Stub", version="1.0.0")
+
+
+def synthetic_text(tokens: int = COMPLETION_TOKENS) -> List[str]:
+    words = ["This", "is", "a", "stubbed", "response", "for", "load", "testing."]
+    return [words[i % len(words)] + " " for i in range(tokens)]
+
+
+def token_delay() -> float:
+    return 1.0 / TOKENS_PER_SEC if TOKENS_PER_SEC > 0 else 0.0
+
+
+def openai_completion(body: Dict[str, Any], tokens: List[str]) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+    }
+
+
+def openai_stream(body: Dict[str, Any], tokens: List[str]) -> List[str]:
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        return "data: " + json.dumps(
+            {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+        ) + "\n\n"
+
+    events = [chunk({"role": "assistant", "content": ""})]
+    events += [chunk({"content": token}) for token in tokens]
+    events += [chunk({}, "stop"), "data: [DONE]\n\n"]
+    return events
+
+
+def anthropic_message(body: Dict[str, Any], tokens: List[str]) -> Dict[str, Any]:
+    return {
+        "id": f"msg_{uuid.uuid4().hex}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "stub"),
+        "content": [{"type": "text", "text": "".join(tokens)}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": len(tokens)},
+    }
+
+
+def anthropic_stream(body: Dict[str, Any], tokens: List[str]) -> List[str]:
+    def event(name: str, data: Dict[str, Any]) -> str:
+        return f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n"
+
+    message = anthropic_message(body, [])
+    message["usage"]["output_tokens"] = 0
+    events = [
+        event("message_start", {"message": message}),
+        event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}}),
+    ]
+    events += [
+        event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": token}})
+        for token in tokens
+    ]
+    events += [
+        event("content_block_stop", {"index": 0}),
+        event(
+            "message_delta",
+            {"delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": len(tokens)}},
+        ),
+        event("message_stop", {}),
+    ]
+    return events
+
+
+async def paced(events: List[str]) -> AsyncIterator[bytes]:
+    """Emit SSE events after the first-token latency at the simulated token rate."""
+    await asyncio.sleep(LATENCY_MS / 1000)
+    delay = token_delay()
+    for event in events:
+        yield event.encode("utf-8")
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def record(provider: str, path: str, request: Request, body: Dict[str, Any], key: str):
+    headers = {
+        name: value
+        for name, value in request.headers.items()
+        if name.lower() in FORWARDED_HEADERS
+    }
+    async with httpx.AsyncClient(base_url=UPSTREAMS[provider], timeout=300) as client:
+        response = await client.post(path, json=body, headers=headers)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    entry = {"key": key, "provider": provider, "stream": bool(body.get("stream"))}
+    if entry["stream"]:
+        # Keep whole SSE events so replay can pace them like live tokens
+        entry["events"] = [event + "\n\n" for event in response.text.split("\n\n") if event.strip()]
+    else:
+        entry["response"] = response.json()
+    transcripts.add(entry)
+    return entry
+
+
+async def respond(provider: str, path: str, request: Request) -> Any:
+    body = await request.json()
+    key = request_key(provider, body)
+    stream = bool(body.get("stream"))
+
+    entry = transcripts.get(key)
+    if entry is None and STUB_MODE == "record":
+        entry = await record(provider, path, request, body, key)
+    if entry is None and STUB_STRICT:
+        raise HTTPException(status_code=404, detail=f"No recording for request {key}")
+
+    if entry is not None and entry.get("stream") == stream:
+        if stream:
+            return StreamingResponse(paced(entry["events"]), media_type="text/event-stream")
+        await asyncio.sleep(LATENCY_MS / 1000)
+        return JSONResponse(entry["response"])
+
+    tokens = synthetic_text()
+    if stream:
+        events = openai_stream(body, tokens) if provider == "openai" else anthropic_stream(body, tokens)
+        return StreamingResponse(paced(events), media_type="text/event-stream")
+    await asyncio.sleep(LATENCY_MS / 1000 + len(tokens) * token_delay())
+    if provider == "openai":
+        return JSONResponse(openai_completion(body, tokens))
+    return JSONResponse(anthropic_message(body, tokens))
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    return await respond("openai", "/v1/chat/completions", request)
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    return await respond("anthropic", "/v1/messages", request)
+
+
+@app.get("/")
+async def root():
+    return {"mode": STUB_MODE, "recordings": len(transcripts.entries)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("STUB_PORT", 8100)))
@@ -1,62 +1,225 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import (
+    APIRouter,
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
 import os
 import json
-from datetime import datetime
+import socket
+import time
 import asyncio
+import httpx
+from anthropic import AsyncAnthropic
 from openai import AsyncOpenAI
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 import uuid
 
 # Load environment variables first
 load_dotenv()
 
-# Verify required environment variables
-required_env_vars = [
-    'FIREBASE_PROJECT_ID',
-    'FIREBASE_CLIENT_EMAIL', 
-    'FIREBASE_PRIVATE_KEY',
-    'OPENAI_API_KEY'
+from data.analytics import get_dashboard
+from data.archive import (
+    acquire_sweep_lease,
+    archive_lesson_plan,
+    list_archived_plans,
+    release_sweep_lease,
+    sweep_stale_plans,
+)
+from data.generation import generation_metrics
+from data.grading import GradingBatcher
+from data.graph_layout import get_graph_with_layout
+from data.learning_path import next_concepts, path_to_concept
+from data.search import search
+from data.utils import (
+    db,
+    get_lessons,
+    init_firestore,
+    list_lesson_plans,
+    touch_lesson_plan,
+)
+from content_generation import build_leader
+from realtime import update_hub
+from singleflight import SingleFlight, prompt_key
+from snippet_analysis import SnippetBatcher, make_snippet_analyzer
+
+ARCHIVE_SWEEP_INTERVAL = int(os.getenv("ARCHIVE_SWEEP_INTERVAL", 3600))
+AGENT_REBUILD_RETRY_SECONDS = float(os.getenv("AGENT_REBUILD_RETRY_SECONDS", 5))
+
+# Server settings, per worker process
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", 0)) or None
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", 4))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 100))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", 30))
+CORS_ALLOW_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
+    if origin.strip()
 ]
 
-for key in required_env_vars:
-    if not os.getenv(key):
-        print(f"Missing environment variable {key}. Please add it to .env")
-        exit(1)
-
-# Initialize Firebase Admin SDK
-service_account_info = {
-    "type": "service_account",
-    "project_id": os.getenv('FIREBASE_PROJECT_ID'),
-    "client_email": os.getenv('FIREBASE_CLIENT_EMAIL'),
-    "private_key": os.getenv('FIREBASE_PRIVATE_KEY').replace('\\n', '\n'),
-    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-    "token_uri": "https://oauth2.googleapis.com/token",
-    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-    "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{os.getenv('FIREBASE_CLIENT_EMAIL')}"
-}
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate(service_account_info)
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
-
-# Initialize FastAPI app
-app = FastAPI(title="Lesson Planner API", version="1.0.0")
-
-# Enable CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+
+def check_environment():
+    """
+    Fail startup when required settings are missing. Firebase credentials
+    come from a key file (FIRESTORE_PATH) or from the FIREBASE_* variables.
+    """
+    missing = [] if os.getenv("OPENAI_API_KEY") else ["OPENAI_API_KEY"]
+    if not os.getenv("FIRESTORE_PATH"):
+        missing += [
+            key
+            for key in ['FIREBASE_PROJECT_ID', 'FIREBASE_CLIENT_EMAIL', 'FIREBASE_PRIVATE_KEY']
+            if not os.getenv(key)
+        ]
+    if missing:
+        raise RuntimeError(
+            f"Missing environment variables {', '.join(missing)}. Please add them to .env"
+        )
+
+
+def pooled_http_client() -> httpx.AsyncClient:
+    """A keep-alive connection pool, shared by every call an SDK client makes."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(600.0, connect=5.0),
+    )
+
+
+class AgentPool:
+    """
+    Prebuilt Learning Orchestrator teams. A team keeps per-run state (its
+    memory, agentic context and member interactions), so each request checks
+    one out for the length of its run, and a used team is replaced with a
+    fresh one instead of being handed to the next user. A failed rebuild is
+    retried, and the pool reports unhealthy until one succeeds.
+    """
+
+    def __init__(self, build, size: int, retry_delay: float = AGENT_REBUILD_RETRY_SECONDS):
+        self.build = build
+        self.size = size
+        self.retry_delay = retry_delay
+        self.rebuild_failures = 0
+        self.last_error: Optional[str] = None
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(build())
+
+    @asynccontextmanager
+    async def checkout(self):
+        leader = await self._idle.get()
+        try:
+            yield leader
+        finally:
+            # Rebuilt after the response is sent; the shared clients make it cheap
+            asyncio.get_running_loop().call_soon(self._replenish)
+
+    def _replenish(self) -> None:
+        try:
+            leader = self.build()
+        except Exception as e:
+            print(f"Error rebuilding agent team: {e}")
+            self.rebuild_failures += 1
+            self.last_error = str(e)
+            asyncio.get_running_loop().call_later(self.retry_delay, self._replenish)
+            return
+        self.rebuild_failures = 0
+        self.last_error = None
+        self._idle.put_nowait(leader)
+
+    @property
+    def healthy(self) -> bool:
+        return self.rebuild_failures == 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"size": self.size, "idle": self._idle.qsize()}
+        if not self.healthy:
+            stats["rebuildFailures"] = self.rebuild_failures
+            stats["lastError"] = self.last_error
+        return stats
+
+
+# Identifies this worker when it holds the archive sweeper lease
+SWEEPER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def sweep_archives_forever():
+    # The lease outlives one interval so a healthy holder keeps it between sweeps
+    lease_ttl = ARCHIVE_SWEEP_INTERVAL * 2
+    while True:
+        try:
+            if await asyncio.to_thread(acquire_sweep_lease, SWEEPER_ID, lease_ttl):
+                archived = await asyncio.to_thread(sweep_stale_plans)
+                if archived:
+                    print(f"Archived {archived} stale lesson plans")
+        except Exception as e:
+            print(f"Error sweeping stale lesson plans: {e}")
+        await asyncio.sleep(ARCHIVE_SWEEP_INTERVAL)
+
+
+def ping_firestore():
+    # Creates the client and opens the gRPC channel so the first request does not pay for it
+    init_firestore()
+    list(db.collection("users").limit(1).stream())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build this worker's shared clients and agents, and tear them down on exit."""
+    state = app.state
+    state.ready = False
+    state.warmup = {"started_at": time.time()}
+
+    state.openai_client = AsyncOpenAI(http_client=pooled_http_client())
+    state.anthropic_client = AsyncAnthropic(http_client=pooled_http_client())
+    state.snippet_batcher = SnippetBatcher(make_snippet_analyzer(state.openai_client))
+    state.prompt_runs = SingleFlight()
+    state.grading_batcher = GradingBatcher()
+    state.agents = AgentPool(
+        lambda: build_leader(state.openai_client, state.anthropic_client),
+        AGENT_POOL_SIZE,
+    )
+    state.archive_sweeper = None
+    if ARCHIVE_SWEEP_INTERVAL > 0:
+        state.archive_sweeper = asyncio.create_task(sweep_archives_forever())
+
+    try:
+        await asyncio.to_thread(ping_firestore)
+        state.warmup["firestore"] = "ok"
+    except Exception as e:
+        print(f"Error warming up Firestore: {e}")
+        state.warmup["firestore"] = f"error: {e}"
+    state.warmup["agents"] = AGENT_POOL_SIZE
+    state.warmup["finished_at"] = time.time()
+    state.ready = state.warmup["firestore"] == "ok"
+
+    try:
+        yield
+    finally:
+        state.ready = False
+        if state.archive_sweeper:
+            state.archive_sweeper.cancel()
+            try:
+                await asyncio.to_thread(release_sweep_lease, SWEEPER_ID)
+            except Exception as e:
+                print(f"Error releasing archive sweeper lease: {e}")
+        update_hub.close()
+        await state.openai_client.close()
+        await state.anthropic_client.close()
+
+
+router = APIRouter()
 
 # Pydantic models
 class UserPromptRequest(BaseModel):
@@ -72,15 +235,71 @@ class UserPromptPostResponse(BaseModel):
     message: str
     userId: str
     prompt: str
+    deduplicated: bool = False
+
+class Snippet(BaseModel):
+    text: str
+    url: Optional[str] = None
+    title: Optional[str] = None
+
+class SnippetAnalysisRequest(BaseModel):
+    userId: str
+    snippets: List[Snippet]
+
+class SnippetAnalysisResponse(BaseModel):
+    userId: str
+    results: List[Dict[str, Any]]
+
+class QuizAnswer(BaseModel):
+    questionId: str
+    answer: str
+
+class QuizSession(BaseModel):
+    userId: str
+    planId: str
+    lessonId: str
+    answers: List[QuizAnswer]
+
+class QuizGradeRequest(BaseModel):
+    sessions: List[QuizSession]
+
+class QuizGradeResponse(BaseModel):
+    results: List[Dict[str, Any]]
 
 # Routes
-@app.get("/")
+@router.get("/")
 async def root():
     return {"message": "Lesson Planner API is running"}
 
+# GET ENDPOINT - Liveness, the worker process is up and serving
+@router.get("/healthz")
+async def healthz():
+    """Return ok while the event loop is responsive"""
+    return {"status": "ok", "pid": os.getpid()}
+
+# GET ENDPOINT - Readiness, warm-up has finished and dependencies answer
+@router.get("/readyz")
+async def readyz(request: Request):
+    """Return 200 once this worker is warm, 503 with the warm-up report until then"""
+    state = request.app.state
+    body = {
+        "ready": getattr(state, "ready", False),
+        "pid": os.getpid(),
+        "warmup": getattr(state, "warmup", {}),
+    }
+    if hasattr(state, "agents"):
+        body["agents"] = state.agents.stats()
+        body["ready"] = body["ready"] and state.agents.healthy
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 # GET ENDPOINT - Get prompt from user and call POST
-@app.get("/api/user-prompt")
-async def get_user_prompt(userId: str, prompt: str):
+@router.get("/api/user-prompt")
+async def get_user_prompt(
+    userId: str,
+    prompt: str,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+):
     """Get prompt from user and forward it to the POST endpoint"""
     
     if not userId:
@@ -96,7 +315,9 @@ async def get_user_prompt(userId: str, prompt: str):
         request_data = UserPromptRequest(userId=userId, prompt=prompt)
         
         # Call the POST endpoint internally
-        post_response = await post_user_prompt(request_data)
+        post_response = await post_user_prompt(
+            request_data, http_request, idempotency_key
+        )
         
         print(f"POST response: {post_response}")
         return post_response
@@ -106,9 +327,17 @@ async def get_user_prompt(userId: str, prompt: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # POST ENDPOINT - Receive prompt from partners
-@app.post("/api/user-prompt", response_model=UserPromptPostResponse)
-async def post_user_prompt(request: UserPromptRequest):
-    """Receive prompt from frontend partners"""
+@router.post("/api/user-prompt", response_model=UserPromptPostResponse)
+async def post_user_prompt(
+    request: UserPromptRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+):
+    """Receive prompt from frontend partners
+    
+    Duplicate submissions of the same (userId, prompt), optionally scoped
+    by an Idempotency-Key header, share one generation run and its result.
+    """
     
     if not request.userId:
         raise HTTPException(status_code=400, detail="Missing userId")
@@ -119,28 +348,284 @@ async def post_user_prompt(request: UserPromptRequest):
     try:
         print(f"Received prompt from user {request.userId}: {request.prompt}")
         
-        # Store the prompt locally (in memory for this request)
-        local_data = {
-            "userId": request.userId,
-            "prompt": request.prompt,
-            "timestamp": datetime.utcnow()
-        }
+        state = http_request.app.state
+        
+        async def generate():
+            async with state.agents.checkout() as leader:
+                run = await leader.arun(
+                    f"user_id={request.userId}, prompt={request.prompt}",
+                    user_id=request.userId,
+                    session_id=str(uuid.uuid4()),
+                )
+            return run.content
         
-        # Process the prompt here or forward it somewhere else
-        # For now, just acknowledge receipt
+        key = prompt_key(request.userId, request.prompt, idempotency_key)
+        message, deduplicated = await state.prompt_runs.do(key, generate)
+        if deduplicated:
+            print(f"Reusing generation run for user {request.userId}")
         
         return UserPromptPostResponse(
             success=True,
-            message="Prompt received successfully",
+            message=str(message),
             userId=request.userId,
-            prompt=request.prompt
+            prompt=request.prompt,
+            deduplicated=deduplicated
         )
         
     except Exception as e:
         print(f"Error in POST /api/user-prompt: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# POST ENDPOINT - Map captured page text and highlights to knowledge nodes
+@router.post("/api/snippets", response_model=SnippetAnalysisResponse)
+async def analyze_snippets(request: SnippetAnalysisRequest, http_request: Request):
+    """Analyze snippets from the extension's content script in batches"""
+    
+    if not request.userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    snippets = [
+        snippet.model_dump() for snippet in request.snippets if snippet.text.strip()
+    ]
+    if not snippets:
+        raise HTTPException(status_code=400, detail="Missing snippets")
+    
+    try:
+        snippet_batcher = http_request.app.state.snippet_batcher
+        results = await snippet_batcher.submit(request.userId, snippets)
+        return SnippetAnalysisResponse(userId=request.userId, results=results)
+        
+    except Exception as e:
+        print(f"Error in POST /api/snippets: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - Next concepts to study from the prerequisite graph
+@router.get("/api/learning-path/next")
+async def get_next_concepts(userId: str, limit: int = 5):
+    """Return the best concepts to study next for a user"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        concepts = await asyncio.to_thread(next_concepts, userId, limit)
+        return {"userId": userId, "concepts": concepts}
+        
+    except Exception as e:
+        print(f"Error in GET /api/learning-path/next: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - Study path to a target concept
+@router.get("/api/learning-path")
+async def get_learning_path(userId: str, target: str):
+    """Return the unlearned prerequisites of a concept in study order"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    if not target:
+        raise HTTPException(status_code=400, detail="Missing target")
+    
+    try:
+        path = await asyncio.to_thread(path_to_concept, userId, target)
+    except Exception as e:
+        print(f"Error in GET /api/learning-path: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown concept {target}")
+    return {"userId": userId, **path}
+
+# GET ENDPOINT - Knowledge graph with precomputed node positions
+@router.get("/api/knowledge-graph")
+async def get_knowledge_graph(userId: str):
+    """Return a user's concept graph and its cached layout"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        graph = await asyncio.to_thread(get_graph_with_layout, userId)
+        return {"userId": userId, **graph}
+        
+    except Exception as e:
+        print(f"Error in GET /api/knowledge-graph: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - Dashboard rollups from the user's summary document
+@router.get("/api/dashboard")
+async def get_dashboard_summary(userId: str):
+    """Return mastery distribution, due concepts, plan progress and streaks"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        dashboard = await asyncio.to_thread(get_dashboard, userId)
+        return {"userId": userId, **dashboard}
+        
+    except Exception as e:
+        print(f"Error in GET /api/dashboard: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - Full-text search over a user's lessons and concepts
+@router.get("/api/search")
+async def search_user_content(userId: str, q: str, page: int = 1, pageSize: int = 10):
+    """Return ranked, paginated matches with highlighted snippets"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    if page < 1 or not 1 <= pageSize <= 50:
+        raise HTTPException(status_code=400, detail="Invalid page or pageSize")
+    
+    try:
+        results = await asyncio.to_thread(search, userId, q, page, pageSize)
+        return {"userId": userId, "query": q, **results}
+        
+    except Exception as e:
+        print(f"Error in GET /api/search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - List a user's lesson plans
+@router.get("/api/lesson-plans")
+async def get_lesson_plans(userId: str, includeArchived: bool = False):
+    """Return live lesson plans, and archived plan metadata on request"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        plans = await asyncio.to_thread(list_lesson_plans, userId)
+        response = {"userId": userId, "plans": plans}
+        if includeArchived:
+            response["archived"] = await asyncio.to_thread(list_archived_plans, userId)
+        return response
+        
+    except Exception as e:
+        print(f"Error in GET /api/lesson-plans: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - Lessons of a plan, rehydrating archived plans on access
+@router.get("/api/lesson-plan/{planId}/lessons")
+async def get_plan_lessons(planId: str, userId: str):
+    """Return a plan's lessons with their full content"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        lessons = await asyncio.to_thread(get_lessons, userId, planId)
+        if lessons:
+            await asyncio.to_thread(touch_lesson_plan, userId, planId)
+        return {"userId": userId, "planId": planId, "lessons": lessons}
+        
+    except Exception as e:
+        print(f"Error in GET /api/lesson-plan/{planId}/lessons: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# POST ENDPOINT - Move a plan to cold storage
+@router.post("/api/lesson-plan/{planId}/archive")
+async def archive_plan(planId: str, userId: str):
+    """Archive a lesson plan into a compressed snapshot"""
+    
+    if not userId:
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        archived = await asyncio.to_thread(archive_lesson_plan, userId, planId)
+    except Exception as e:
+        print(f"Error in POST /api/lesson-plan/{planId}/archive: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not archived:
+        raise HTTPException(status_code=404, detail=f"Unknown lesson plan {planId}")
+    return {"success": True, "userId": userId, "planId": planId}
+
+# POST ENDPOINT - Grade whole quiz sessions and update mastery
+@router.post("/api/quiz/grade", response_model=QuizGradeResponse)
+async def grade_quiz_sessions(request: QuizGradeRequest, http_request: Request):
+    """Grade quiz sessions in bulk, batched with other sessions submitted at the same time"""
+    
+    if not request.sessions:
+        raise HTTPException(status_code=400, detail="Missing sessions")
+    
+    if any(not session.userId for session in request.sessions):
+        raise HTTPException(status_code=400, detail="Missing userId")
+    
+    try:
+        grading_batcher = http_request.app.state.grading_batcher
+        results = await grading_batcher.submit(
+            [session.model_dump() for session in request.sessions]
+        )
+        return QuizGradeResponse(results=results)
+        
+    except Exception as e:
+        print(f"Error in POST /api/quiz/grade: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# GET ENDPOINT - Validation, repair and retry counts for generated output
+@router.get("/api/metrics/generation")
+async def get_generation_metrics():
+    """Return per-schema counts of valid, repaired and failed model output"""
+    return generation_metrics.snapshot()
+
+# WEBSOCKET ENDPOINT - Push graph, lesson and progress changes to clients
+@router.websocket("/ws/updates")
+async def updates_socket(websocket: WebSocket, userId: str):
+    """Stream compact deltas for a user's nodes, edges, lessons and progress"""
+    
+    await websocket.accept()
+    queue = update_hub.subscribe(userId)
+    # Clients only listen, but reading is how a closed tab is noticed while idle
+    receiver = asyncio.ensure_future(websocket.receive())
+    try:
+        while True:
+            sender = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {receiver, sender}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver in done:
+                sender.cancel()
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.ensure_future(websocket.receive())
+            if sender in done:
+                await websocket.send_json(sender.result())
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Error in WS /ws/updates: {e}")
+    finally:
+        receiver.cancel()
+        update_hub.unsubscribe(userId, queue)
+
+
+def create_app() -> FastAPI:
+    """Build the app. Each worker process calls this once through uvicorn's factory mode."""
+    check_environment()
+    app = FastAPI(title="Lesson Planner API", version="1.0.0", lifespan=lifespan)
+    
+    # Credentials are only allowed with an explicit list of origins
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ALLOW_ORIGINS,
+        allow_credentials="*" not in CORS_ALLOW_ORIGINS,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=port,
+        workers=WEB_CONCURRENCY,
+        limit_concurrency=MAX_CONCURRENCY,
+        timeout_keep_alive=int(HTTP_KEEPALIVE_SECONDS),
+    )
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, Optional, Set, Tuple
+
+from data.model import LessonPlanStatus
+from data.utils import db
+
+MAX_QUEUED_MESSAGES = 1000
+
+# Each watched plan costs two listeners (lessons and progress), so only the
+# most recently used live plans are streamed; clients read the rest over REST
+MAX_WATCHED_PLANS = int(os.getenv("REALTIME_MAX_WATCHED_PLANS", "5"))
+WATCH_RECENT_SECONDS = float(os.getenv("REALTIME_WATCH_RECENT_DAYS", "14")) * 86400
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return None
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+def _plan_activity(plan: Dict[str, Any]) -> Optional[float]:
+    """When a plan was last used, or None if it should not be streamed."""
+    if plan.get("status") == LessonPlanStatus.ARCHIVED.value:
+        return None
+    used = plan.get("last_accessed") or plan.get("created_at")
+    if not isinstance(used, datetime):
+        return None
+    used = used.timestamp()
+    if used < time.time() - WATCH_RECENT_SECONDS:
+        return None
+    return used
+
+
+class UserFeed:
+    """
+    One set of Firestore listeners for a user, shared by every open client.
+    Changes are turned into compact deltas (only changed fields) and fanned
+    out to each subscriber's queue on the event loop.
+    """
+
+    def __init__(self, userId: str, loop: asyncio.AbstractEventLoop):
+        self.userId = userId
+        self.loop = loop
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.state: Dict[Tuple[str, Optional[str], str], Dict[str, Any]] = {}
+        self.watches: Dict[Tuple[str, Optional[str]], Any] = {}
+        self.plans: Dict[str, float] = {}
+        self.closed = False
+        self.lock = Lock()
+
+    def start(self) -> None:
+        userdb = db.collection("users").document(self.userId)
+        graph_ref = userdb.collection("knowledgeGraph")
+        self._watch("node", None, graph_ref.document("nodeHolder").collection("nodes"))
+        self._watch("edge", None, graph_ref.document("edgeHolder").collection("edges"))
+        self._watch("lessonPlan", None, userdb.collection("lessonPlans"))
+
+    def stop(self) -> None:
+        with self.lock:
+            self.closed = True
+            watches = list(self.watches.values())
+            self.watches.clear()
+        for watch in watches:
+            watch.unsubscribe()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state of every watched document, for newly joined clients."""
+        with self.lock:
+            deltas = [
+                self._delta(kind, planId, docId, "upsert", fields)
+                for (kind, planId, docId), fields in self.state.items()
+            ]
+        return {"type": "snapshot", "deltas": deltas}
+
+    def _watch(self, kind: str, planId: Optional[str], collection) -> None:
+        def on_change(docs, changes, read_time):
+            self._on_change(kind, planId, changes)
+
+        with self.lock:
+            if self.closed or (kind, planId) in self.watches:
+                return
+            self.watches[(kind, planId)] = collection.on_snapshot(on_change)
+
+    def _unwatch_plan(self, planId: str) -> None:
+        with self.lock:
+            watches = [self.watches.pop((kind, planId), None) for kind in ("lesson", "progress")]
+            for key in [key for key in self.state if key[1] == planId]:
+                del self.state[key]
+        for watch in watches:
+            if watch is not None:
+                watch.unsubscribe()
+
+    def _sync_plan_watches(self) -> None:
+        """Stream lessons and progress for the most recently used live plans only."""
+        with self.lock:
+            wanted = set(sorted(self.plans, key=self.plans.get, reverse=True)[:MAX_WATCHED_PLANS])
+            watched = {planId for kind, planId in self.watches if kind == "lesson"}
+        for planId in watched - wanted:
+            self._unwatch_plan(planId)
+        plans_ref = db.collection("users").document(self.userId).collection("lessonPlans")
+        for planId in wanted - watched:
+            plan_ref = plans_ref.document(planId)
+            self._watch("lesson", planId, plan_ref.collection("lessons"))
+            self._watch("progress", planId, plan_ref.collection("progress"))
+
+    def _on_change(self, kind: str, planId: Optional[str], changes) -> None:
+        # Runs on a Firestore listener thread
+        deltas = []
+        for change in changes:
+            docId = change.document.id
+            key = (kind, planId, docId)
+            if change.type.name == "REMOVED":
+                with self.lock:
+                    self.state.pop(key, None)
+                    if kind == "lessonPlan":
+                        self.plans.pop(docId, None)
+                deltas.append(self._delta(kind, planId, docId, "remove"))
+                continue
+
+            raw = change.document.to_dict()
+            if kind == "lessonPlan":
+                used = _plan_activity(raw)
+                with self.lock:
+                    if used is None:
+                        self.plans.pop(docId, None)
+                    else:
+                        self.plans[docId] = used
+            data = _jsonable(raw)
+            with self.lock:
+                previous = self.state.get(key, {})
+                self.state[key] = data
+            fields = {
+                name: value for name, value in data.items() if previous.get(name) != value
+            }
+            removed = [name for name in previous if name not in data]
+            if fields or removed:
+                delta = self._delta(kind, planId, docId, "upsert", fields)
+                if removed:
+                    delta["removedFields"] = removed
+                deltas.append(delta)
+
+        if kind == "lessonPlan":
+            self._sync_plan_watches()
+        if deltas:
+            self.loop.call_soon_threadsafe(self._publish, {"type": "delta", "deltas": deltas})
+
+    @staticmethod
+    def _delta(
+        kind: str,
+        planId: Optional[str],
+        docId: str,
+        op: str,
+        fields: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        delta = {"kind": kind, "op": op, "id": docId}
+        if planId is not None:
+            delta["planId"] = planId
+        if fields is not None:
+            delta["fields"] = fields
+        return delta
+
+    def _publish(self, message: Dict[str, Any]) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A slow client gets the full state again instead of every delta
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.snapshot())
+
+
+class UpdateHub:
+    """Multiplexes per-user feeds so one listener set serves all of a user's tabs."""
+
+    def __init__(self):
+        self.feeds: Dict[str, UserFeed] = {}
+
+    def subscribe(self, userId: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUED_MESSAGES)
+        feed = self.feeds.get(userId)
+        if feed is None:
+            feed = UserFeed(userId, asyncio.get_running_loop())
+            self.feeds[userId] = feed
+            feed.start()
+        else:
+            queue.put_nowait(feed.snapshot())
+        feed.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, userId: str, queue: asyncio.Queue) -> None:
+        feed = self.feeds.get(userId)
+        if feed is None:
+            return
+        feed.subscribers.discard(queue)
+        if not feed.subscribers:
+            del self.feeds[userId]
+            feed.stop()
+
+    def close(self) -> None:
+        for feed in self.feeds.values():
+            feed.stop()
+        self.feeds.clear()
+
+
+update_hub = UpdateHub()
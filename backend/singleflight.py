@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# How long a finished run is replayed to retries of the same request
+RESULT_TTL_SECONDS = float(os.getenv("PROMPT_REPLAY_WINDOW", "600"))
+MAX_RESULTS = 1024
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Casefold and collapse whitespace so trivially different retries match."""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip(".!?").casefold()
+
+
+def prompt_key(userId: str, prompt: str, idempotency_key: Optional[str] = None) -> str:
+    """
+    Key a prompt run by (userId, prompt), plus the client's idempotency key
+    when given. Reusing an idempotency key with a different prompt starts a
+    new run instead of replaying the old result.
+    """
+    digest = hashlib.sha256(f"{userId}\0{normalize_prompt(prompt)}".encode("utf-8"))
+    if idempotency_key:
+        return f"idem:{userId}:{idempotency_key}:{digest.hexdigest()}"
+    return f"prompt:{digest.hexdigest()}"
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one in-flight run and
+    replays its result to repeats that arrive within the replay window.
+    Failed runs are not remembered, so a retry after an error runs again.
+    """
+
+    def __init__(self, ttl: float = RESULT_TTL_SECONDS, max_results: int = MAX_RESULTS):
+        self.ttl = ttl
+        self.max_results = max_results
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._results: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run fn once per key, returning (result, shared) where shared means deduplicated."""
+        cached = self._results.get(key)
+        if cached is not None:
+            expires, result = cached
+            if expires > time.monotonic():
+                return result, True
+            del self._results[key]
+
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # A disconnecting caller must not cancel the run other callers wait on
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (time.monotonic() + self.ttl, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List
+
+from openai import AsyncOpenAI
+
+from data.utils import get_knowledge_nodes
+
+SNIPPET_MODEL = os.getenv("SNIPPET_MODEL", "gpt-4o-mini")
+
+# How long to wait for more snippets from the same user before calling the model
+BATCH_WINDOW_SECONDS = float(os.getenv("SNIPPET_BATCH_WINDOW", "0.5"))
+MAX_BATCH_SIZE = int(os.getenv("SNIPPET_MAX_BATCH", "32"))
+MAX_SNIPPET_CHARS = 2000
+
+ANALYSIS_INSTRUCTIONS = """You map text snippets a learner highlighted on web pages to concepts in their knowledge graph.
+You are given the learner's existing concepts as "concept_id: name" lines and a numbered list of snippets.
+For every snippet return the ids of the existing concepts it covers, and propose new concepts only when no existing concept fits.
+Respond with JSON only, in this format:
+{"results": [{"index": 0, "concept_ids": ["str"], "new_concepts": [{"name": "str", "description": "str"}]}]}"""
+
+
+def snippet_hash(text: str) -> str:
+    """Hash a snippet after normalizing case and whitespace."""
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SnippetBatcher:
+    """
+    Collects snippets per user over a short window and analyzes each window
+    with a single call. Identical snippets within a window, or already
+    waiting on an in-flight call, share one result.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[str, List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+        window: float = BATCH_WINDOW_SECONDS,
+        max_batch: int = MAX_BATCH_SIZE,
+    ):
+        self.analyze = analyze
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._in_flight: Dict[str, Dict[str, asyncio.Future]] = {}
+
+    async def submit(
+        self, userId: str, snippets: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Queue snippets for a user and wait for their per-snippet results."""
+        futures = [self._enqueue(userId, snippet) for snippet in snippets]
+        # Futures are shared with other requests for the same snippet, so a
+        # disconnecting caller must not cancel them
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    def _enqueue(self, userId: str, snippet: Dict[str, Any]) -> asyncio.Future:
+        digest = snippet_hash(snippet["text"])
+        in_flight = self._in_flight.get(userId, {})
+        if digest in in_flight:
+            return in_flight[digest]
+
+        batch = self._pending.get(userId)
+        if batch is None:
+            batch = {"snippets": {}, "futures": {}}
+            batch["timer"] = asyncio.get_running_loop().call_later(
+                self.window, self._flush, userId
+            )
+            self._pending[userId] = batch
+
+        if digest not in batch["futures"]:
+            batch["snippets"][digest] = {**snippet, "hash": digest}
+            batch["futures"][digest] = asyncio.get_running_loop().create_future()
+        future = batch["futures"][digest]
+
+        if len(batch["snippets"]) >= self.max_batch:
+            self._flush(userId)
+        return future
+
+    def _flush(self, userId: str) -> None:
+        batch = self._pending.pop(userId, None)
+        if batch is None:
+            return
+        batch["timer"].cancel()
+        self._in_flight.setdefault(userId, {}).update(batch["futures"])
+        asyncio.ensure_future(self._run(userId, batch))
+
+    async def _run(self, userId: str, batch: Dict[str, Any]) -> None:
+        snippets = list(batch["snippets"].values())
+        try:
+            results = await self.analyze(userId, snippets)
+            for snippet, result in zip(snippets, results):
+                future = batch["futures"][snippet["hash"]]
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            print(f"Error analyzing snippets for user {userId}: {e}")
+            for future in batch["futures"].values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            in_flight = self._in_flight.get(userId, {})
+            for digest in batch["futures"]:
+                in_flight.pop(digest, None)
+            if not in_flight:
+                self._in_flight.pop(userId, None)
+
+
+def build_snippet_prompt(
+    nodes: List[Dict[str, Any]], snippets: List[Dict[str, Any]]
+) -> str:
+    concept_lines = "\n".join(f"{node['concept_id']}: {node['name']}" for node in nodes)
+    snippet_lines = "\n\n".join(
+        f"[{index}] ({snippet.get('title') or snippet.get('url') or 'unknown page'})\n"
+        f"{snippet['text'][:MAX_SNIPPET_CHARS]}"
+        for index, snippet in enumerate(snippets)
+    )
+    return (
+        f"Existing concepts:\n{concept_lines or '(none yet)'}\n\n"
+        f"Snippets:\n{snippet_lines}"
+    )
+
+
+def make_snippet_analyzer(client: AsyncOpenAI, model: str = SNIPPET_MODEL):
+    """Return an analyze(userId, snippets) coroutine backed by one chat completion per batch."""
+
+    async def analyze(
+        userId: str, snippets: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        nodes = await asyncio.to_thread(get_knowledge_nodes, userId)
+        names = {node["concept_id"]: node["name"] for node in nodes}
+
+        completion = await client.chat.completions.create(
+            model=model,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": ANALYSIS_INSTRUCTIONS},
+                {"role": "user", "content": build_snippet_prompt(nodes, snippets)},
+            ],
+        )
+        output = json.loads(completion.choices[0].message.content or "{}")
+        by_index = {
+            item.get("index"): item
+            for item in output.get("results", [])
+            if isinstance(item, dict)
+        }
+
+        results = []
+        for index, snippet in enumerate(snippets):
+            item = by_index.get(index, {})
+            matches = [
+                {"concept_id": concept_id, "name": names[concept_id]}
+                for concept_id in item.get("concept_ids", [])
+                if concept_id in names
+            ]
+            new_concepts = [
+                {"name": concept["name"], "description": concept.get("description", "")}
+                for concept in item.get("new_concepts", [])
+                if isinstance(concept, dict) and concept.get("name")
+            ]
+            results.append(
+                {
+                    "hash": snippet["hash"],
+                    "matches": matches,
+                    "new_concepts": new_concepts,
+                }
+            )
+        return results
+
+    return analyze
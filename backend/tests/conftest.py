@@ -0,0 +1,41 @@
+import os
+import sys
+from unittest import mock
+
+import firebase_admin
+import pytest
+from firebase_admin import credentials, firestore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Unit tests never talk to Firestore; data.utils initializes against a mock
+os.environ.setdefault("FIRESTORE_PATH", "unused.json")
+mock.patch.object(credentials, "Certificate").start()
+mock.patch.object(firebase_admin, "initialize_app").start()
+mock.patch.object(firestore, "client").start()
+
+from tests.fake_firestore import FakeClient
+
+
+@pytest.fixture
+def use_fake_db(monkeypatch):
+    """Point every module's Firestore client and the content store at a FakeClient."""
+    import realtime
+    from data import analytics, archive, grading, graph_layout, search, transfer, utils
+    from data.content_store import ContentStore
+
+    def use(client):
+        for module in (utils, analytics, archive, grading, graph_layout, search, transfer, realtime):
+            monkeypatch.setattr(module, "db", client)
+        store = ContentStore(client.collection("lessonContent"))
+        for module in (utils, grading):
+            monkeypatch.setattr(module, "content_store", store)
+        monkeypatch.setattr(utils, "_touched", {})
+        return client
+
+    return use
+
+
+@pytest.fixture
+def fake_db(use_fake_db):
+    return use_fake_db(FakeClient())
@@ -0,0 +1,203 @@
+"""A small in-memory stand-in for the Firestore client, enough for unit tests."""
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1.transforms import Increment
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeDocument:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return FakeCollection(self.client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name):
+        return FakeCollection(self.client, f"{self.path}/{name}")
+
+    def collections(self):
+        prefix = f"{self.path}/"
+        names = sorted(
+            {
+                path[len(prefix) :].split("/", 1)[0]
+                for path in self.client.store
+                if path.startswith(prefix)
+            }
+        )
+        return [self.collection(name) for name in names]
+
+    def get(self):
+        return FakeSnapshot(self, self.client.store.get(self.path))
+
+    def set(self, data, merge=False):
+        existing = self.client.store.get(self.path, {}) if merge else {}
+        self.client.store[self.path] = _merge(existing, data)
+
+    def create(self, data):
+        if self.path in self.client.store:
+            raise AlreadyExists(self.path)
+        self.client.store[self.path] = dict(data)
+
+    def update(self, data):
+        if self.path not in self.client.store:
+            raise NotFound(self.path)
+        self.client.store[self.path] = {**self.client.store[self.path], **data}
+
+    def delete(self):
+        self.client.store.pop(self.path, None)
+
+
+class FakeCollection:
+    def __init__(self, client, path, filters=(), order=None):
+        self.client = client
+        self.path = path
+        self.filters = filters
+        self.order = order
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, docId):
+        return FakeDocument(self.client, f"{self.path}/{docId}")
+
+    def list_documents(self):
+        prefix = f"{self.path}/"
+        ids = sorted(
+            {
+                path[len(prefix) :].split("/", 1)[0]
+                for path in self.client.store
+                if path.startswith(prefix)
+            }
+        )
+        return [self.document(docId) for docId in ids]
+
+    def select(self, field_paths):
+        return self
+
+    def limit(self, count):
+        return self
+
+    def where(self, field, op, value):
+        filters = self.filters + ((field, op, value),)
+        return FakeCollection(self.client, self.path, filters, self.order)
+
+    def order_by(self, field):
+        return FakeCollection(self.client, self.path, self.filters, field)
+
+    def on_snapshot(self, callback):
+        self.client.watches.setdefault(self.path, []).append(callback)
+        return FakeWatch(self.client, self.path, callback)
+
+    def stream(self):
+        snapshots = []
+        for doc in self.list_documents():
+            data = self.client.store.get(doc.path)
+            if data is None:
+                continue
+            if all(_matches(data.get(field), op, value) for field, op, value in self.filters):
+                snapshots.append(FakeSnapshot(doc, data))
+        if self.order:
+            snapshots.sort(key=lambda snapshot: snapshot.get(self.order))
+        return iter(snapshots)
+
+
+class FakeWatch:
+    def __init__(self, client, path, callback):
+        self.client = client
+        self.path = path
+        self.callback = callback
+
+    def unsubscribe(self):
+        self.client.watches[self.path].remove(self.callback)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def set(self, ref, data, merge=False):
+        self.operations.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self.operations.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self.operations.append(ref.delete)
+
+    def commit(self):
+        self.client.commits += 1
+        for operation in self.operations:
+            operation()
+
+
+class FakeBulkWriter(FakeBatch):
+    def flush(self):
+        self.commit()
+        self.operations = []
+
+    def close(self):
+        self.flush()
+
+
+class FakeClient:
+    def __init__(self):
+        self.store = {}
+        self.commits = 0
+        self.reads = 0
+        self.watches = {}
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def document(self, path):
+        return FakeDocument(self, path)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def bulk_writer(self):
+        return FakeBulkWriter(self)
+
+    def get_all(self, refs):
+        self.reads += 1
+        return [ref.get() for ref in refs]
+
+
+def _matches(actual, op, value):
+    if op == "==":
+        return actual == value
+    if op == "in":
+        return actual in value
+    if op == "<":
+        return actual is not None and actual < value
+    raise NotImplementedError(op)
+
+
+def _merge(existing, data):
+    merged = dict(existing)
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        elif isinstance(value, Increment):
+            merged[key] = merged.get(key, 0) + value.value
+        else:
+            merged[key] = value
+    return merged
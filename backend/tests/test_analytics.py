@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import pytest
+
+from data import analytics
+from data.analytics import compute_dashboard, get_dashboard, streaks
+
+
+def test_streaks_counts_consecutive_days():
+    days = ["2026-01-01", "2026-01-02", "2026-01-03", "2026-01-07", "2026-01-08"]
+    assert streaks(days, date(2026, 1, 9)) == {"current": 2, "longest": 3}
+    assert streaks(days, date(2026, 1, 10)) == {"current": 0, "longest": 3}
+    assert streaks([], date(2026, 1, 1)) == {"current": 0, "longest": 0}
+
+
+def test_streaks_ignores_duplicate_days():
+    assert streaks(["2026-01-01", "2026-01-01", "2026-01-02"], date(2026, 1, 2)) == {
+        "current": 2,
+        "longest": 2,
+    }
+
+
+def test_compute_dashboard_rollups():
+    now = datetime(2026, 1, 10, 12)
+    summary = {
+        "nodes": {
+            "a": [95, datetime(2026, 1, 1).timestamp()],
+            "b": [15, datetime(2026, 2, 1).timestamp()],
+        },
+        "plans": {"plan_1": {"lesson_count": 4, "status": "active"}},
+        "progress": {
+            "plan_1": {
+                "lesson_1": ["completed", 90, 0.0],
+                "lesson_2": ["in_progress", 30, 0.0],
+            }
+        },
+        "activity_days": ["2026-01-09", "2026-01-10"],
+    }
+    dashboard = compute_dashboard(summary, now)
+    assert dashboard["concept_count"] == 2
+    assert dashboard["mastery"]["average"] == 55.0
+    assert dashboard["due"] == {"count": 1, "concept_ids": ["a"]}
+    assert dashboard["plans"][0]["percent_complete"] == 25.0
+    assert dashboard["plans"][0]["average_mastery_score"] == 60.0
+    assert dashboard["streak"] == {"current": 2, "longest": 2}
+
+
+def test_partial_summary_is_rebuilt(fake_db):
+    # An older node written before summaries existed
+    fake_db.store["users/u/knowledgeGraph/nodeHolder/nodes/old"] = {
+        "mastery_level": 40,
+        "next_review": datetime(2026, 1, 1),
+    }
+    fake_db.store["users/u/knowledgeGraph/nodeHolder/nodes/new"] = {
+        "mastery_level": 80,
+        "next_review": datetime(2026, 1, 1),
+    }
+    # The first incremental write after deploy only merged the new node
+    fake_db.store["users/u/summary/dashboard"] = {"nodes": {"new": [80, 0.0]}}
+
+    dashboard = get_dashboard("u")
+    assert dashboard["concept_count"] == 2
+    assert fake_db.store["users/u/summary/dashboard"]["built"] is True
+
+
+def test_built_summary_is_served_without_rebuild(fake_db, monkeypatch):
+    fake_db.store["users/u/summary/dashboard"] = {"built": True, "nodes": {"a": [10, 0.0]}}
+    monkeypatch.setattr(analytics, "rebuild_summary", pytest.fail)
+    assert get_dashboard("u")["concept_count"] == 1
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from data import archive, utils
+
+
+def test_encode_document_round_trip():
+    value = {"at": datetime(2026, 1, 2, 3, 4), "raw": b"\x00\x01", "items": [1, "a"]}
+    assert archive.decode_document(archive.encode_document(value)) == value
+
+
+def add_plan(client, lessons):
+    client.store["users/u/lessonPlans/p"] = {
+        "title": "Plan",
+        "description": "desc",
+        "last_accessed": datetime(2025, 1, 1),
+        "status": "active",
+    }
+    for lessonId, content in lessons.items():
+        client.store[f"users/u/lessonPlans/p/lessons/{lessonId}"] = {
+            "title": lessonId,
+            "content": content,
+            "order": 0,
+        }
+    client.store["users/u/lessonPlans/p/progress/l0"] = {"mastery_score": 50}
+
+
+def test_archive_and_rehydrate_round_trip(fake_db):
+    add_plan(fake_db, {"l0": "short body"})
+    assert archive.archive_lesson_plan("u", "p")
+    assert "users/u/lessonPlans/p" not in fake_db.store
+    assert "users/u/lessonPlans/p/lessons/l0" not in fake_db.store
+
+    assert archive.rehydrate_lesson_plan("u", "p")
+    assert fake_db.store["users/u/lessonPlans/p/lessons/l0"]["content"] == "short body"
+    assert fake_db.store["users/u/lessonPlans/p/progress/l0"]["mastery_score"] == 50
+    assert "users/u/archivedPlans/p" not in fake_db.store
+
+
+def test_large_legacy_snapshots_are_chunked(fake_db, monkeypatch):
+    monkeypatch.setattr(archive, "MAX_INLINE_BYTES", 256)
+    # Incompressible inline content, as lessons written before the content store
+    body = bytes(range(256)).hex() * 8
+    add_plan(fake_db, {f"l{i}": body + str(i) for i in range(3)})
+
+    assert archive.archive_lesson_plan("u", "p")
+    document = fake_db.store["users/u/archivedPlans/p"]
+    assert "data" not in document and document["chunk_count"] > 1
+    assert all(
+        len(fake_db.store[f"users/u/archivedPlans/p/chunks/{i}"]["data"]) <= 256
+        for i in range(document["chunk_count"])
+    )
+    assert archive.list_archived_plans("u")[0]["lesson_count"] == 3
+
+    assert archive.rehydrate_lesson_plan("u", "p")
+    assert fake_db.store["users/u/lessonPlans/p/lessons/l2"]["content"] == body + "2"
+    assert not [path for path in fake_db.store if "/archivedPlans/" in path]
+
+
+def test_reading_lessons_has_no_side_effects(fake_db):
+    add_plan(fake_db, {"l0": "body"})
+
+    assert [lesson["lesson_id"] for lesson in utils.get_lessons("u", "p")] == ["l0"]
+    assert utils.get_lesson_plan("u", "p") is not None
+    assert fake_db.store["users/u/lessonPlans/p"]["last_accessed"] == datetime(2025, 1, 1)
+
+
+def test_touch_bumps_last_accessed_once_per_interval(fake_db):
+    add_plan(fake_db, {"l0": "body"})
+
+    utils.touch_lesson_plan("u", "p")
+    assert fake_db.store["users/u/lessonPlans/p"]["last_accessed"] > datetime(2025, 1, 1)
+
+    fake_db.store["users/u/lessonPlans/p"]["last_accessed"] = datetime(2025, 1, 1)
+    utils.touch_lesson_plan("u", "p")
+    assert fake_db.store["users/u/lessonPlans/p"]["last_accessed"] == datetime(2025, 1, 1)
+
+
+def test_touching_an_archived_plan_is_harmless(fake_db):
+    utils.touch_lesson_plan("u", "missing")
+    assert "users/u/lessonPlans/missing" not in fake_db.store
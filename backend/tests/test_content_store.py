@@ -0,0 +1,74 @@
+import os
+import zlib
+
+from data import content_store as content_store_module
+from data.content_store import ContentStore, compress, content_hash, decompress, make_preview
+from tests.fake_firestore import FakeClient
+
+
+def make_store(cache_size=256):
+    client = FakeClient()
+    return client, ContentStore(client.collection("lessonContent"), cache_size)
+
+
+def test_compress_round_trip():
+    raw = "a lesson body ".encode("utf-8") * 100
+    codec, data = compress(raw)
+    assert decompress(codec, data) == raw
+
+
+def test_make_preview_truncates_and_collapses_whitespace():
+    assert make_preview("one\n\n two   three") == "one two three"
+    preview = make_preview("word " * 200, length=20)
+    assert len(preview) <= 20 and preview.endswith("…")
+
+
+def test_put_and_get_inline_body():
+    client, store = make_store()
+    digest = store.put("hello world")
+    assert digest == content_hash("hello world")
+
+    fresh = ContentStore(client.collection("lessonContent"))
+    assert fresh.get(digest) == "hello world"
+
+
+def test_chunked_body_round_trip(monkeypatch):
+    monkeypatch.setattr(content_store_module, "MAX_INLINE_BYTES", 64)
+    client, store = make_store()
+    body = os.urandom(2000).hex()
+    digest = store.put(body)
+
+    parent = client.store[f"lessonContent/{digest}"]
+    assert parent["chunk_count"] > 1
+    assert ContentStore(client.collection("lessonContent")).get(digest) == body
+
+
+def test_second_writer_does_not_overwrite_chunks(monkeypatch):
+    monkeypatch.setattr(content_store_module, "MAX_INLINE_BYTES", 64)
+    client, store = make_store()
+    body = os.urandom(2000).hex()
+    digest = store.put(body)
+    chunks_before = {
+        path: data for path, data in client.store.items() if "/chunks/" in path
+    }
+
+    # A writer with a different codec must leave the stored body alone
+    monkeypatch.setattr(
+        content_store_module, "compress", lambda raw: ("zlib", zlib.compress(raw, 1))
+    )
+    ContentStore(client.collection("lessonContent")).put(body)
+
+    chunks_after = {
+        path: data for path, data in client.store.items() if "/chunks/" in path
+    }
+    assert chunks_after == chunks_before
+    assert ContentStore(client.collection("lessonContent")).get(digest) == body
+
+
+def test_incomplete_chunked_body_reads_as_missing(monkeypatch):
+    monkeypatch.setattr(content_store_module, "MAX_INLINE_BYTES", 64)
+    client, store = make_store()
+    digest = store.put(os.urandom(2000).hex())
+    client.store.pop(f"lessonContent/{digest}/chunks/1")
+
+    assert ContentStore(client.collection("lessonContent")).get(digest) is None
@@ -0,0 +1,133 @@
+import pytest
+from pydantic import ValidationError
+
+from data import utils
+from data.generation import (
+    GeneratedKnowledgeGraph,
+    GeneratedLessonPlan,
+    extract_json,
+    generation_metrics,
+    repair_output,
+)
+
+
+def lesson(**overrides):
+    return {
+        "lesson_id": "lesson_1",
+        "title": "Intro",
+        "objectives": ["Know the basics"],
+        "content": "Body",
+        "external_resources": ["https://example.com"],
+        "order": 0,
+        **overrides,
+    }
+
+
+def plan(**overrides):
+    return {
+        "plan_id": "plan_1",
+        "user_id": "u",
+        "title": "Plan",
+        "description": "A plan",
+        "source_prompt": "teach me",
+        "lessons": [lesson()],
+        **overrides,
+    }
+
+
+def test_valid_output_is_not_repaired():
+    instance, repaired = repair_output(plan(), GeneratedLessonPlan)
+    assert not repaired
+    assert instance.lessons[0].lesson_id == "lesson_1"
+
+
+def test_extract_json_from_fenced_and_truncated_output():
+    assert extract_json('Here you go:\n```json\n{"a": 1}\n```') == {"a": 1}
+    assert extract_json('{"a": [1, 2') == {"a": [1, 2]}
+    with pytest.raises(ValueError):
+        extract_json("no json here")
+
+
+def test_near_misses_are_repaired():
+    output = plan(
+        plan_id=None,
+        planTitle="Plan",
+        lessons=[
+            lesson(
+                lesson_id=None,
+                objectives="First; Second",
+                order="lesson 2",
+            )
+        ],
+    )
+    del output["title"]
+    instance, repaired = repair_output(output, GeneratedLessonPlan)
+    assert repaired
+    assert instance.title == "Plan"
+    assert instance.plan_id.startswith("plan_")
+    assert instance.lessons[0].objectives == ["First", "Second"]
+    assert instance.lessons[0].order == 2
+    assert instance.lessons[0].lesson_id.startswith("lesson_")
+
+
+def test_knowledge_graph_values_are_clamped_and_normalized():
+    output = {
+        "user_id": "u",
+        "nodes": [
+            {
+                "concept_id": "c1",
+                "concept_name": "Vectors",
+                "description": "Arrows",
+                "mastery_level": "150%",
+            }
+        ],
+        "edges": [
+            {
+                "edge_id": "e1",
+                "source": "c1",
+                "target": "c2",
+                "relationship": "Prerequisite For",
+            },
+            {
+                "edge_id": "e2",
+                "source_concept_id": "c1",
+                "target_concept_id": "c2",
+                "relationship_type": "depends on",
+            },
+        ],
+    }
+    instance, repaired = repair_output(output, GeneratedKnowledgeGraph)
+    assert repaired
+    assert instance.nodes[0].name == "Vectors"
+    assert instance.nodes[0].mastery_level == 100
+    assert instance.edges[0].relationship_type.value == "prerequisite_for"
+    assert instance.edges[1].relationship_type.value == "related_to"
+
+
+def test_unrepairable_output_raises_and_is_counted():
+    before = generation_metrics.snapshot().get("GeneratedLessonPlan", {}).get("failed", 0)
+    with pytest.raises(ValidationError):
+        repair_output({"user_id": "u", "lessons": []}, GeneratedLessonPlan)
+    after = generation_metrics.snapshot()["GeneratedLessonPlan"]["failed"]
+    assert after == before + 1
+
+
+def test_writes_return_the_stored_ids(fake_db, monkeypatch):
+    monkeypatch.setattr(utils, "lesson_plan_write_listeners", [])
+    monkeypatch.setattr(utils, "graph_write_listeners", [])
+    generated = plan()
+    del generated["plan_id"]
+    planId = utils.write_lesson_plan("u", generated)
+    assert planId.startswith("plan_")
+    assert f"users/u/lessonPlans/{planId}" in fake_db.store
+
+    node = {
+        "name": "Vectors",
+        "description": "Arrows",
+        "mastery_level": 0,
+        "source_lesson_id": "lesson_1",
+    }
+    ids = utils.write_knowledge_graph("u", [node], [])
+    assert ids["edge_ids"] == []
+    (conceptId,) = ids["concept_ids"]
+    assert f"users/u/knowledgeGraph/nodeHolder/nodes/{conceptId}" in fake_db.store
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from data import archive, grading, learning_path, utils
+from data.grading import (
+    AnswerKeyCache,
+    GradingBatcher,
+    compile_answer_key,
+    grade_submissions,
+    score_answers,
+)
+
+# The quiz block format used by data/model.py
+MODEL_QUIZ = {
+    "type": "quiz",
+    "questions": [
+        {
+            "question": "What does useState return?",
+            "options": ["Array", "Object", "String"],
+            "correct": 0,
+        }
+    ],
+}
+
+TWO_QUESTIONS = json.dumps(
+    [
+        {"type": "text", "value": "Some text"},
+        {
+            "type": "quiz",
+            "questions": [
+                {"id": "q_add", "question": "2 + 2?", "options": ["3", "4"], "answer": 1},
+                {"id": "q_capital", "question": "Capital of France?", "answer": "Paris"},
+            ],
+        },
+    ]
+)
+
+
+def test_answer_key_for_model_quiz_format():
+    key = compile_answer_key(json.dumps([MODEL_QUIZ]))
+    assert key == {"q0": {"array", "a", "0"}}
+
+
+def test_answer_key_accepts_text_index_and_letter():
+    key = compile_answer_key(TWO_QUESTIONS)
+    assert key["q_add"] == {"4", "b", "1"}
+    assert key["q_capital"] == {"paris"}
+    assert compile_answer_key("Plain text lesson") == {}
+
+
+def test_score_counts_each_question_once():
+    key = compile_answer_key(json.dumps([MODEL_QUIZ]))
+    answers = [{"questionId": "q0", "answer": "Array"}] * 3 + [
+        {"questionId": "unknown", "answer": "Array"}
+    ]
+    score, attempts = score_answers(key, answers, datetime.now())
+    assert score == 100
+    assert [attempt["question_id"] for attempt in attempts] == ["q0"]
+
+
+def test_score_uses_last_answer_and_normalizes():
+    key = compile_answer_key(TWO_QUESTIONS)
+    answers = [
+        {"questionId": "q_add", "answer": "3"},
+        {"questionId": "q_add", "answer": " B "},
+        {"questionId": "q_capital", "answer": "paris."},
+    ]
+    assert score_answers(key, answers, datetime.now())[0] == 100
+    assert score_answers(key, answers[:1], datetime.now())[0] == 0
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(grading, "answer_keys", AnswerKeyCache())
+    monkeypatch.setattr(learning_path, "_graphs", {})
+
+
+def add_lesson(client, userId, planId="p", lessonId="l", content=TWO_QUESTIONS):
+    client.store[f"users/{userId}/lessonPlans/{planId}"] = {"title": "Plan"}
+    client.store[f"users/{userId}/lessonPlans/{planId}/lessons/{lessonId}"] = {
+        "title": "Lesson",
+        "content_ref": utils.content_store.put(content),
+        "order": 0,
+    }
+    client.store[f"users/{userId}/knowledgeGraph/nodeHolder/nodes/c_{lessonId}"] = {
+        "name": "Concept",
+        "mastery_level": 0,
+        "repetition_interval": 2,
+        "source_lesson_id": lessonId,
+    }
+
+
+def session(userId, answers, planId="p", lessonId="l"):
+    return {"userId": userId, "planId": planId, "lessonId": lessonId, "answers": answers}
+
+
+CORRECT = [{"questionId": "q_add", "answer": "4"}, {"questionId": "q_capital", "answer": "Paris"}]
+
+
+def test_grading_updates_progress_and_nodes(fake_db):
+    add_lesson(fake_db, "u")
+    [result] = grade_submissions([session("u", CORRECT)])
+
+    assert result["score"] == 100 and result["masteryScore"] == 100
+    progress = fake_db.store["users/u/lessonPlans/p/progress/l"]
+    assert progress["mastery_score"] == 100
+    assert progress["status"] == "completed"
+    node = fake_db.store["users/u/knowledgeGraph/nodeHolder/nodes/c_l"]
+    # Blended with the node's previous level of 0
+    assert node["mastery_level"] == 60
+    assert node["repetition_interval"] == 4
+    assert node["next_review"] > node["last_reviewed"]
+    assert fake_db.store["users/u/summary/dashboard"]["nodes"]["c_l"][0] == 60
+
+
+def test_cohort_is_read_and_written_in_one_round_trip_each(fake_db):
+    for i in range(30):
+        add_lesson(fake_db, f"user{i}")
+    reads, commits = fake_db.reads, fake_db.commits
+
+    results = grade_submissions([session(f"user{i}", CORRECT) for i in range(30)])
+    assert all(result["score"] == 100 for result in results)
+    assert fake_db.reads - reads == 1
+    assert fake_db.commits - commits == 1
+
+
+def test_one_failing_user_does_not_fail_the_batch(fake_db, monkeypatch):
+    add_lesson(fake_db, "good")
+    add_lesson(fake_db, "bad")
+    original = grading._linked_nodes
+
+    def flaky(lessons):
+        if any(userId == "bad" for userId, _ in lessons):
+            raise RuntimeError("deadline exceeded")
+        return original(lessons)
+
+    monkeypatch.setattr(grading, "_linked_nodes", flaky)
+    good, bad = grade_submissions([session("good", CORRECT), session("bad", CORRECT)])
+    assert good["score"] == 100
+    assert bad["error"] == "Grading failed"
+    assert "users/bad/lessonPlans/p/progress/l" not in fake_db.store
+
+
+def test_quiz_of_archived_plan_is_graded_after_restore(fake_db):
+    add_lesson(fake_db, "u")
+    assert archive.archive_lesson_plan("u", "p")
+
+    [result] = grade_submissions([session("u", CORRECT)])
+    assert result["score"] == 100
+    assert "users/u/lessonPlans/p/lessons/l" in fake_db.store
+
+
+def test_unknown_lesson_and_lesson_without_quiz(fake_db):
+    add_lesson(fake_db, "u", lessonId="text", content="Just reading")
+    missing, no_quiz = grade_submissions(
+        [session("u", CORRECT, lessonId="nope"), session("u", CORRECT, lessonId="text")]
+    )
+    assert missing["error"] == "Unknown lesson"
+    assert no_quiz["error"] == "Lesson has no quiz"
+
+
+def test_failed_commit_is_retried_per_user(fake_db, monkeypatch):
+    add_lesson(fake_db, "good")
+    add_lesson(fake_db, "bad")
+    original = grading.commit_in_batches
+
+    def commit(operations):
+        if any("users/bad/" in operation[1].path for operation in operations):
+            raise RuntimeError("permission denied")
+        original(operations)
+
+    monkeypatch.setattr(grading, "commit_in_batches", commit)
+    good, bad = grade_submissions([session("good", CORRECT), session("bad", CORRECT)])
+    assert good["masteryScore"] == 100
+    assert bad["error"] == "Grading failed"
+    assert fake_db.store["users/good/lessonPlans/p/progress/l"]["mastery_score"] == 100
+
+
+def test_cancelled_caller_does_not_fail_the_rest_of_the_batch(fake_db, monkeypatch):
+    add_lesson(fake_db, "leaving")
+    add_lesson(fake_db, "staying")
+    graded = []
+
+    def grade(submissions):
+        graded.append([submission["userId"] for submission in submissions])
+        time.sleep(0.05)
+        return grade_submissions(submissions)
+
+    monkeypatch.setattr(grading, "grade_submissions", grade)
+
+    async def main():
+        batcher = GradingBatcher(window=0.01)
+        leaving = asyncio.ensure_future(batcher.submit([session("leaving", CORRECT)]))
+        staying = asyncio.ensure_future(batcher.submit([session("staying", CORRECT)]))
+        await asyncio.sleep(0.03)
+        leaving.cancel()
+        return await staying
+
+    (result,) = asyncio.run(main())
+    assert graded == [["leaving", "staying"]]
+    assert result["masteryScore"] == 100
+    # The cancelled caller's session was still committed
+    assert fake_db.store["users/leaving/lessonPlans/p/progress/l"]["mastery_score"] == 100
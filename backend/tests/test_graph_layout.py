@@ -0,0 +1,145 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from data import graph_layout
+from data.graph_layout import GraphLayoutCache, force_directed_layout, graph_version
+
+
+def test_graph_version_ignores_order_but_not_structure():
+    a = graph_version(["x", "y", "z"], [("x", "y"), ("y", "z")])
+    b = graph_version(["z", "x", "y"], [("y", "z"), ("x", "y")])
+    assert a == b
+    assert a != graph_version(["x", "y", "z"], [("x", "y")])
+
+
+def test_layout_is_deterministic_and_normalized():
+    edges = np.array([[0, 1], [1, 2], [2, 3]])
+    first = force_directed_layout(4, edges, iterations=50)
+    second = force_directed_layout(4, edges, iterations=50)
+    assert np.array_equal(first, second)
+    assert first.shape == (4, 2)
+    assert first.min() >= 0 and first.max() <= 1
+
+
+def test_connected_nodes_end_up_closer_than_unconnected():
+    edges = np.array([[0, 1]])
+    pos = force_directed_layout(3, edges, iterations=100)
+    connected = np.linalg.norm(pos[0] - pos[1])
+    assert connected < np.linalg.norm(pos[0] - pos[2])
+
+
+def test_trivial_graphs():
+    assert force_directed_layout(0, np.zeros((0, 2), dtype=int)).shape == (0, 2)
+    assert force_directed_layout(1, np.zeros((0, 2), dtype=int)).tolist() == [[0.5, 0.5]]
+
+
+def test_large_graphs_sample_the_repulsion():
+    n = graph_layout.REPULSION_SAMPLE * 2
+    edges = np.stack([np.arange(1, n), np.arange(n - 1)], axis=1)
+    pos = force_directed_layout(n, edges, iterations=20)
+    assert pos.shape == (n, 2)
+    assert len(np.unique(pos.round(4), axis=0)) == n
+
+
+def graph(*concept_ids, edges=()):
+    nodes = [{"concept_id": concept_id} for concept_id in concept_ids]
+    edges = [
+        {"source_concept_id": source, "target_concept_id": target}
+        for source, target in edges
+    ]
+    return nodes, edges
+
+
+@pytest.fixture
+def layout_calls(monkeypatch):
+    calls = []
+    original = graph_layout.force_directed_layout
+
+    def recording(n, edges, **kwargs):
+        calls.append(kwargs)
+        return original(n, edges, **kwargs)
+
+    monkeypatch.setattr(graph_layout, "force_directed_layout", recording)
+    return calls
+
+
+def test_layout_is_cached_per_graph_version(fake_db, layout_calls):
+    cache = GraphLayoutCache()
+    first = cache.get_layout("u", *graph("a", "b", edges=[("a", "b")]))
+    assert cache.get_layout("u", *graph("b", "a", edges=[("a", "b")])) is first
+    assert len(layout_calls) == 1
+
+    second = cache.get_layout("u", *graph("a", "b"))
+    assert second["version"] != first["version"]
+    assert len(layout_calls) == 2
+
+
+def test_layout_is_persisted_and_reloaded(fake_db, layout_calls):
+    layout = GraphLayoutCache().get_layout("u", *graph("a", "b", edges=[("a", "b")]))
+    assert fake_db.store["users/u/knowledgeGraph/layout"] == layout
+
+    reloaded = GraphLayoutCache().get_layout("u", *graph("a", "b", edges=[("a", "b")]))
+    assert reloaded == layout
+    assert len(layout_calls) == 1
+
+
+def test_small_changes_start_from_the_previous_layout(fake_db, layout_calls):
+    cache = GraphLayoutCache()
+    ids = [f"c{i}" for i in range(10)]
+    chain = list(zip(ids, ids[1:]))
+    before = cache.get_layout("u", *graph(*ids, edges=chain))
+
+    after = cache.get_layout("u", *graph(*ids, "new", edges=chain + [("c9", "new")]))
+    assert layout_calls[-1]["iterations"] == graph_layout.WARM_ITERATIONS
+    assert layout_calls[-1]["positions"].shape == (11, 2)
+    moved = [
+        np.linalg.norm(np.subtract(after["positions"][i], before["positions"][i]))
+        for i in ids
+    ]
+    assert max(moved) < 0.3
+
+    # Replacing most of the graph lays it out from scratch
+    cache.get_layout("u", *graph("x", "y", "z"))
+    assert "positions" not in layout_calls[-1]
+
+
+def test_concurrent_requests_share_one_layout(fake_db, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    original = graph_layout.force_directed_layout
+
+    def slow(n, edges, **kwargs):
+        calls.append(n)
+        started.set()
+        release.wait(5)
+        return original(n, edges, **kwargs)
+
+    monkeypatch.setattr(graph_layout, "force_directed_layout", slow)
+    cache = GraphLayoutCache()
+    nodes, edges = graph("a", "b", edges=[("a", "b")])
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = [pool.submit(cache.get_layout, "u", nodes, edges) for _ in range(3)]
+        started.wait(5)
+        release.set()
+        layouts = [result.result() for result in results]
+    assert calls == [2]
+    assert all(layout == layouts[0] for layout in layouts)
+
+
+def test_graph_writes_refresh_the_layout_in_the_background(fake_db, monkeypatch):
+    cache = GraphLayoutCache()
+    monkeypatch.setattr(graph_layout, "layout_cache", cache)
+    fake_db.store["users/u/knowledgeGraph/nodeHolder/nodes/a"] = {"name": "A"}
+    fake_db.store["users/u/knowledgeGraph/nodeHolder/nodes/b"] = {"name": "B"}
+
+    graph_layout._schedule_layout("u", [], [])
+    graph_layout._refresh_pool.submit(lambda: None).result()
+    for _ in range(100):
+        if "users/u/knowledgeGraph/layout" in fake_db.store:
+            break
+        time.sleep(0.01)
+    assert set(fake_db.store["users/u/knowledgeGraph/layout"]["positions"]) == {"a", "b"}
@@ -0,0 +1,106 @@
+import pytest
+
+from data.learning_path import LearningPathGraph
+
+
+def prerequisite(source, target):
+    return {
+        "source_concept_id": source,
+        "target_concept_id": target,
+        "relationship_type": "prerequisite_for",
+    }
+
+
+def chain_graph():
+    # algebra -> calculus -> ode, algebra -> linalg
+    return LearningPathGraph.from_documents(
+        [
+            {"concept_id": "algebra", "name": "Algebra", "mastery_level": 0},
+            {"concept_id": "calculus", "name": "Calculus", "mastery_level": 0},
+            {"concept_id": "ode", "name": "ODEs", "mastery_level": 0},
+            {"concept_id": "linalg", "name": "Linear Algebra", "mastery_level": 0},
+        ],
+        [
+            prerequisite("algebra", "calculus"),
+            prerequisite("calculus", "ode"),
+            prerequisite("algebra", "linalg"),
+        ],
+    )
+
+
+def test_add_prerequisite_keeps_transitive_closure():
+    graph = chain_graph()
+    algebra, ode = graph.index["algebra"], graph.index["ode"]
+    assert (graph.ancestors[ode] >> algebra) & 1
+    assert (graph.descendants[algebra] >> ode) & 1
+
+
+def test_add_prerequisite_rejects_cycles():
+    graph = chain_graph()
+    with pytest.raises(ValueError):
+        graph.add_prerequisite("ode", "algebra")
+    with pytest.raises(ValueError):
+        graph.add_prerequisite("algebra", "algebra")
+
+
+def test_cyclic_edge_documents_are_skipped():
+    graph = chain_graph()
+    assert not graph.add_edge_document(prerequisite("ode", "algebra"))
+    assert not graph.add_edge_document(
+        {"source_concept_id": "ode", "target_concept_id": "algebra", "relationship_type": "related_to"}
+    )
+
+
+def test_next_concepts_only_offers_unlocked_concepts():
+    graph = chain_graph()
+    assert [c["concept_id"] for c in graph.next_concepts()] == ["algebra"]
+
+    graph.set_mastery("algebra", 90)
+    ready = [c["concept_id"] for c in graph.next_concepts()]
+    # calculus unlocks ode as well, so it ranks ahead of linalg
+    assert ready == ["calculus", "linalg"]
+
+
+def test_path_to_lists_unlearned_prerequisites_in_order():
+    graph = chain_graph()
+    graph.set_mastery("algebra", 85)
+    path = graph.path_to("ode")
+    assert [step["concept_id"] for step in path["steps"]] == ["calculus", "ode"]
+    assert path["remaining_mastery"] == 200
+    assert graph.path_to("missing") is None
+
+
+def test_cached_graph_is_reloaded_after_writes_in_other_workers(fake_db, monkeypatch):
+    from data import learning_path, utils
+
+    nodes = [{"concept_id": "a", "name": "A", "mastery_level": 0}]
+    monkeypatch.setattr(learning_path, "_graphs", {})
+    monkeypatch.setattr(learning_path, "get_knowledge_nodes", lambda userId: list(nodes))
+    monkeypatch.setattr(learning_path, "get_knowledge_edges", lambda userId: [])
+
+    assert [c["concept_id"] for c in learning_path.next_concepts("u")] == ["a"]
+    # Another worker wrote a node; this worker's listener never saw it
+    nodes.append({"concept_id": "b", "name": "B", "mastery_level": 0})
+    assert len(learning_path.next_concepts("u")) == 1
+
+    utils.bump_write_version("u", "graph")
+    assert len(learning_path.next_concepts("u")) == 2
+
+
+def test_own_mastery_writes_do_not_reload_the_graph(fake_db, monkeypatch):
+    from data import learning_path, utils
+
+    loads = []
+    monkeypatch.setattr(learning_path, "_graphs", {})
+    monkeypatch.setattr(
+        learning_path,
+        "get_knowledge_nodes",
+        lambda userId: loads.append(userId) or [{"concept_id": "a", "mastery_level": 0}],
+    )
+    monkeypatch.setattr(learning_path, "get_knowledge_edges", lambda userId: [])
+
+    assert len(learning_path.next_concepts("u")) == 1
+    utils.bump_write_version("u", "mastery")
+    learning_path.update_mastery("u", [("a", 90)])
+    assert learning_path.next_concepts("u") == []
+    assert loads == ["u"]
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+from loadtest.loadgen import LoadResult, fire, percentile
+from loadtest.stub_server import request_key
+
+
+def test_request_key_masks_timestamps():
+    body = {"messages": [{"role": "system", "content": "Now is 2026-10-19 08:15:02.123456"}]}
+    later = {"messages": [{"role": "system", "content": "Now is 2026-10-20T17:45"}]}
+    assert request_key("openai", body) == request_key("openai", later)
+
+
+def test_request_key_separates_prompts_and_providers():
+    body = {"messages": [{"role": "user", "content": "I want to learn rust (1)"}]}
+    other = {"messages": [{"role": "user", "content": "I want to learn rust (2)"}]}
+    assert request_key("openai", body) != request_key("openai", other)
+    assert request_key("openai", body) != request_key("anthropic", body)
+    # Key order in the body does not matter
+    assert request_key("openai", {"a": 1, "b": 2}) == request_key("openai", {"b": 2, "a": 1})
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile([], 50) == 0.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile(values, 0) == 1.0
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+
+
+def test_latency_counts_time_queued_behind_the_in_flight_limit():
+    async def main():
+        result = LoadResult()
+        transport = httpx.MockTransport(lambda request: httpx.Response(200))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            limit = asyncio.Semaphore(1)
+            await limit.acquire()
+            scheduled = time.perf_counter()
+            task = asyncio.create_task(fire(client, "GET", "/", None, result, limit, scheduled))
+            await asyncio.sleep(0.05)
+            limit.release()
+            await task
+        return result
+
+    result = asyncio.run(main())
+    assert result.statuses == {200: 1}
+    assert result.latencies[0] >= 0.05
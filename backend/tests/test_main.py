@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("agno")
+
+from fastapi.testclient import TestClient
+
+import main
+from main import AgentPool
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "ARCHIVE_SWEEP_INTERVAL", 0)
+    monkeypatch.setattr(main, "AGENT_POOL_SIZE", 2)
+    monkeypatch.setattr(main, "build_leader", lambda *clients: object())
+    monkeypatch.setattr(main, "ping_firestore", lambda: None)
+    return main.create_app()
+
+
+def test_create_app_rejects_missing_settings(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("FIRESTORE_PATH", raising=False)
+    monkeypatch.delenv("FIREBASE_PRIVATE_KEY", raising=False)
+    with pytest.raises(RuntimeError) as error:
+        main.create_app()
+    assert "OPENAI_API_KEY" in str(error.value)
+    assert "FIREBASE_PRIVATE_KEY" in str(error.value)
+
+
+def test_readyz_reports_warm_workers(app):
+    with TestClient(app) as client:
+        response = client.get("/readyz")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["warmup"]["firestore"] == "ok"
+    assert body["agents"] == {"size": 2, "idle": 2}
+
+
+def test_readyz_is_unavailable_when_firestore_fails(app, monkeypatch):
+    def unreachable():
+        raise ConnectionError("no route to Firestore")
+
+    monkeypatch.setattr(main, "ping_firestore", unreachable)
+    with TestClient(app) as client:
+        response = client.get("/readyz")
+        assert client.get("/healthz").status_code == 200
+    assert response.status_code == 503
+    assert "no route to Firestore" in response.json()["warmup"]["firestore"]
+
+
+def test_readyz_is_unavailable_while_agent_rebuilds_fail(app):
+    with TestClient(app) as client:
+        client.app.state.agents.rebuild_failures = 1
+        client.app.state.agents.last_error = "boom"
+        response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["agents"]["lastError"] == "boom"
+
+
+def test_agent_pool_hands_out_fresh_teams():
+    built = []
+
+    def build():
+        built.append(object())
+        return built[-1]
+
+    async def main_():
+        pool = AgentPool(build, 2)
+        async with pool.checkout() as first:
+            assert pool.stats() == {"size": 2, "idle": 1}
+        await asyncio.sleep(0)
+        assert pool.stats() == {"size": 2, "idle": 2}
+        async with pool.checkout() as second:
+            pass
+        return first, second
+
+    first, second = asyncio.run(main_())
+    assert first is built[0]
+    assert second is built[1]
+    assert len(built) == 4
+
+
+def test_agent_pool_retries_failed_rebuilds():
+    attempts = []
+
+    def build():
+        attempts.append(len(attempts))
+        if len(attempts) in (2, 3):
+            raise RuntimeError("model config unavailable")
+        return object()
+
+    async def main_():
+        pool = AgentPool(build, 1, retry_delay=0.01)
+        async with pool.checkout():
+            pass
+        await asyncio.sleep(0)
+        assert not pool.healthy
+        assert pool.stats()["lastError"] == "model config unavailable"
+        async with pool.checkout():
+            assert pool.healthy
+        return pool
+
+    pool = asyncio.run(asyncio.wait_for(main_(), 1))
+    assert len(attempts) == 5
+    assert pool.size == 1
@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import realtime
+from realtime import UpdateHub, UserFeed
+from tests.fake_firestore import FakeSnapshot
+
+
+def change(client, path, kind="ADDED", data=None):
+    document = FakeSnapshot(client.document(path), data)
+    return SimpleNamespace(type=SimpleNamespace(name=kind), document=document)
+
+
+def plan(days_idle=0, status="active"):
+    return {
+        "title": "Plan",
+        "status": status,
+        "last_accessed": datetime.now() - timedelta(days=days_idle),
+    }
+
+
+def published(feed):
+    """Run the loop once so call_soon_threadsafe deliveries land."""
+    messages = []
+    queue = asyncio.Queue()
+    feed.subscribers.add(queue)
+    feed.loop.run_until_complete(asyncio.sleep(0))
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    feed.subscribers.discard(queue)
+    return messages
+
+
+@pytest.fixture
+def feed(fake_db):
+    loop = asyncio.new_event_loop()
+    feed = UserFeed("u", loop)
+    feed.start()
+    yield feed
+    feed.stop()
+    loop.close()
+
+
+def test_changes_publish_only_changed_and_removed_fields(feed, fake_db):
+    path = "users/u/knowledgeGraph/nodeHolder/nodes/n1"
+    at = datetime(2026, 1, 2)
+    feed._on_change("node", None, [change(fake_db, path, data={"name": "A", "mastery_level": 10, "last_reviewed": at})])
+    feed._on_change("node", None, [change(fake_db, path, "MODIFIED", {"name": "A", "mastery_level": 40})])
+    feed._on_change("node", None, [change(fake_db, path, "MODIFIED", {"name": "A", "mastery_level": 40})])
+
+    first, second = [message["deltas"] for message in published(feed)]
+    assert first == [
+        {
+            "kind": "node",
+            "op": "upsert",
+            "id": "n1",
+            "fields": {"name": "A", "mastery_level": 10, "last_reviewed": at.isoformat()},
+        }
+    ]
+    assert second == [
+        {
+            "kind": "node",
+            "op": "upsert",
+            "id": "n1",
+            "fields": {"mastery_level": 40},
+            "removedFields": ["last_reviewed"],
+        }
+    ]
+
+    feed._on_change("node", None, [change(fake_db, path, "REMOVED")])
+    assert published(feed)[0]["deltas"] == [{"kind": "node", "op": "remove", "id": "n1"}]
+    assert feed.snapshot() == {"type": "snapshot", "deltas": []}
+
+
+def test_slow_consumer_gets_a_snapshot_instead_of_every_delta(feed, fake_db):
+    queue = asyncio.Queue(maxsize=2)
+    feed.subscribers.add(queue)
+    for i in range(3):
+        path = f"users/u/knowledgeGraph/nodeHolder/nodes/n{i}"
+        feed._on_change("node", None, [change(fake_db, path, data={"name": str(i)})])
+    feed.loop.run_until_complete(asyncio.sleep(0))
+
+    assert queue.qsize() == 1
+    message = queue.get_nowait()
+    assert message["type"] == "snapshot"
+    assert {delta["id"] for delta in message["deltas"]} == {"n0", "n1", "n2"}
+
+
+def lesson_watches(fake_db):
+    return {
+        path.split("/")[3]
+        for path, callbacks in fake_db.watches.items()
+        if path.endswith("/lessons") and callbacks
+    }
+
+
+def test_plans_are_unwatched_when_removed_or_archived(feed, fake_db):
+    feed._on_change(
+        "lessonPlan",
+        None,
+        [
+            change(fake_db, "users/u/lessonPlans/p1", data=plan()),
+            change(fake_db, "users/u/lessonPlans/p2", data=plan()),
+        ],
+    )
+    assert lesson_watches(fake_db) == {"p1", "p2"}
+    feed._on_change("lesson", "p1", [change(fake_db, "users/u/lessonPlans/p1/lessons/l0", data={"title": "L"})])
+
+    feed._on_change("lessonPlan", None, [change(fake_db, "users/u/lessonPlans/p1", "REMOVED")])
+    assert lesson_watches(fake_db) == {"p2"}
+    assert not fake_db.watches["users/u/lessonPlans/p1/progress"]
+    assert all(key[1] != "p1" for key in feed.state)
+
+    feed._on_change(
+        "lessonPlan", None, [change(fake_db, "users/u/lessonPlans/p2", "MODIFIED", plan(status="archived"))]
+    )
+    assert lesson_watches(fake_db) == set()
+
+
+def test_only_recent_plans_are_watched(feed, fake_db, monkeypatch):
+    monkeypatch.setattr(realtime, "MAX_WATCHED_PLANS", 2)
+    feed._on_change(
+        "lessonPlan",
+        None,
+        [
+            change(fake_db, "users/u/lessonPlans/idle", data=plan(days_idle=60)),
+            change(fake_db, "users/u/lessonPlans/old", data=plan(days_idle=3)),
+            change(fake_db, "users/u/lessonPlans/new", data=plan(days_idle=1)),
+            change(fake_db, "users/u/lessonPlans/newest", data=plan()),
+        ],
+    )
+    assert lesson_watches(fake_db) == {"new", "newest"}
+
+    # Opening an older plan swaps it in for the least recently used one
+    feed._on_change("lessonPlan", None, [change(fake_db, "users/u/lessonPlans/idle", "MODIFIED", plan())])
+    assert lesson_watches(fake_db) == {"idle", "newest"}
+
+
+def test_hub_shares_one_feed_per_user(fake_db):
+    async def main():
+        hub = UpdateHub()
+        first = hub.subscribe("u")
+        second = hub.subscribe("u")
+        assert len(hub.feeds) == 1
+        assert second.get_nowait()["type"] == "snapshot"
+        hub.unsubscribe("u", first)
+        assert "u" in hub.feeds
+        hub.unsubscribe("u", second)
+        assert hub.feeds == {}
+
+    asyncio.run(main())
+    assert not any(fake_db.watches.values())
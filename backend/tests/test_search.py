@@ -0,0 +1,90 @@
+from data.search import SearchIndex, to_match_expression
+
+
+def test_to_match_expression_quotes_terms_and_prefixes_the_last():
+    assert to_match_expression("Eigen vectors") == '"eigen" "vectors"*'
+    assert to_match_expression('foo" OR bar') == '"foo" "or" "bar"*'
+    assert to_match_expression("  ?! ") == ""
+
+
+def test_search_ranks_title_matches_and_highlights():
+    index = SearchIndex(":memory:")
+    index.upsert("u", "lesson", "l1", "p1", "Matrices", "eigenvectors appear here")
+    index.upsert("u", "lesson", "l2", "p1", "Eigenvectors", "the main topic")
+    results = index.search("u", "eigenvec")
+    assert results["total"] == 2
+    assert [r["id"] for r in results["results"]] == ["l2", "l1"]
+    assert "<mark>" in results["results"][1]["snippet"]
+
+
+def test_same_lesson_id_in_two_plans_is_kept_apart():
+    index = SearchIndex(":memory:")
+    index.upsert("u", "lesson", "lesson_1", "planA", "Linear algebra", "eigenvectors")
+    index.upsert("u", "lesson", "lesson_1", "planB", "Calculus", "derivatives")
+    assert index.search("u", "eigenvectors")["total"] == 1
+    assert index.search("u", "derivatives")["total"] == 1
+
+
+def test_upsert_replaces_and_remove_deletes():
+    index = SearchIndex(":memory:")
+    index.upsert("u", "lesson", "l1", "p1", "Old title", "old body")
+    index.upsert("u", "lesson", "l1", "p1", "New title", "new body")
+    assert index.search("u", "old")["total"] == 0
+    assert index.search("u", "new")["total"] == 1
+
+    index.remove("u", "lesson", "p1", "l1")
+    assert index.search("u", "new")["total"] == 0
+
+
+def test_results_are_scoped_to_the_user():
+    index = SearchIndex(":memory:")
+    index.upsert("u1", "concept", "c1", "", "Recursion", "functions calling themselves")
+    assert index.search("u2", "recursion")["total"] == 0
+
+
+def test_user_index_is_rebuilt_after_writes_in_other_workers(fake_db, monkeypatch):
+    from data import search as search_module
+    from data import utils
+
+    fake_db.store["users/u/lessonPlans/p1"] = {"title": "Plan"}
+    lessons = {"p1": [{"lesson_id": "l1", "title": "Graphs", "content": "nodes"}]}
+    monkeypatch.setattr(search_module, "search_index", SearchIndex(":memory:"))
+    monkeypatch.setattr(search_module, "get_knowledge_nodes", lambda userId: [])
+    backfills = []
+
+    def get_lessons(userId, planId):
+        backfills.append(planId)
+        return lessons[planId]
+
+    monkeypatch.setattr(search_module, "get_lessons", get_lessons)
+
+    assert search_module.search("u", "graphs")["total"] == 1
+    assert search_module.search("u", "graphs")["total"] == 1
+    assert backfills == ["p1"]
+
+    # Renamed by another worker, so no listener ran in this one
+    lessons["p1"] = [{"lesson_id": "l1", "title": "Trees", "content": "nodes"}]
+    utils.bump_write_version("u", "lessons")
+    assert search_module.search("u", "trees")["total"] == 1
+    assert search_module.search("u", "graphs")["total"] == 0
+    assert backfills == ["p1", "p1"]
+
+
+def test_own_writes_keep_the_index_current(fake_db, monkeypatch):
+    from data import search as search_module
+    from data import utils
+
+    monkeypatch.setattr(search_module, "search_index", SearchIndex(":memory:"))
+    monkeypatch.setattr(search_module, "get_knowledge_nodes", lambda userId: [])
+    search_module.ensure_indexed("u")
+
+    node = {"concept_id": "c1", "name": "Recursion", "description": ""}
+    utils.bump_write_version("u", "graph")
+    search_module._index_nodes("u", [node], [])
+    assert search_module.search_index.indexed_version("u") == (0, 1)
+
+    # A write this worker missed leaves the index to be rebuilt
+    utils.bump_write_version("u", "lessons")
+    utils.bump_write_version("u", "graph")
+    search_module._index_nodes("u", [node], [])
+    assert search_module.search_index.indexed_version("u") == (0, 1)
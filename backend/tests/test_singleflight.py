@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, normalize_prompt, prompt_key
+
+
+def test_prompt_keys_match_trivially_different_retries():
+    assert normalize_prompt("  Teach me   Linear Algebra! ") == "teach me linear algebra"
+    assert prompt_key("u", "Teach me algebra") == prompt_key("u", "teach me  algebra.")
+    assert prompt_key("u", "algebra") != prompt_key("v", "algebra")
+    assert prompt_key("u", "a", "key-1") == prompt_key("u", "A.", "key-1")
+    assert prompt_key("u", "a", "key-1") != prompt_key("u", "a", "key-2")
+    # A reused idempotency key must not replay another prompt's result
+    assert prompt_key("u", "a", "key-1") != prompt_key("u", "b", "key-1")
+
+
+def test_concurrent_calls_share_one_run():
+    calls = 0
+
+    async def run():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "plan"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", run) for _ in range(5)))
+        replay = await flight.do("k", run)
+        return results, replay
+
+    results, replay = asyncio.run(main())
+    assert calls == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert replay == ("plan", True)
+
+
+def test_failed_runs_are_not_remembered():
+    attempts = 0
+
+    async def run():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("model timeout")
+        return "plan"
+
+    async def main():
+        flight = SingleFlight()
+        with pytest.raises(RuntimeError):
+            await flight.do("k", run)
+        return await flight.do("k", run)
+
+    assert asyncio.run(main()) == ("plan", False)
@@ -0,0 +1,62 @@
+import asyncio
+
+from snippet_analysis import SnippetBatcher, snippet_hash
+
+
+def test_snippet_hash_ignores_case_and_whitespace():
+    assert snippet_hash("Eigen  values\n") == snippet_hash("eigen values")
+    assert snippet_hash("eigenvalues") != snippet_hash("eigen values")
+
+
+def test_snippets_in_one_window_share_one_call_and_dedupe():
+    calls = []
+
+    async def analyze(userId, snippets):
+        calls.append([snippet["text"] for snippet in snippets])
+        return [{"text": snippet["text"]} for snippet in snippets]
+
+    async def main():
+        batcher = SnippetBatcher(analyze, window=0.01)
+        return await asyncio.gather(
+            batcher.submit("u", [{"text": "Vectors"}, {"text": "Matrices"}]),
+            batcher.submit("u", [{"text": "vectors "}]),
+        )
+
+    first, second = asyncio.run(main())
+    assert calls == [["Vectors", "Matrices"]]
+    assert second == [first[0]]
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    calls = []
+
+    async def analyze(userId, snippets):
+        calls.append(len(snippets))
+        return [{} for _ in snippets]
+
+    async def main():
+        batcher = SnippetBatcher(analyze, window=60, max_batch=2)
+        return await asyncio.wait_for(
+            batcher.submit("u", [{"text": "a"}, {"text": "b"}]), timeout=1
+        )
+
+    assert asyncio.run(main()) == [{}, {}]
+    assert calls == [2]
+
+
+def test_cancelled_caller_does_not_fail_a_shared_snippet():
+    async def analyze(userId, snippets):
+        await asyncio.sleep(0.02)
+        return [{"text": snippet["text"]} for snippet in snippets]
+
+    async def main():
+        batcher = SnippetBatcher(analyze, window=0.01)
+        leaving = asyncio.ensure_future(batcher.submit("u", [{"text": "Vectors"}]))
+        staying = asyncio.ensure_future(
+            batcher.submit("u", [{"text": "vectors"}, {"text": "Matrices"}])
+        )
+        await asyncio.sleep(0.015)
+        leaving.cancel()
+        return await staying
+
+    assert asyncio.run(main()) == [{"text": "Vectors"}, {"text": "Matrices"}]
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+
+import pytest
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+from data import archive, transfer, utils
+from tests.fake_firestore import FakeClient
+
+
+def test_export_includes_content_of_archived_plans(fake_db, use_fake_db, tmp_path):
+    digest = utils.content_store.put("archived lesson body")
+    fake_db.store["users/u/lessonPlans/p"] = {"title": "Plan", "status": "active"}
+    fake_db.store["users/u/lessonPlans/p/lessons/l0"] = {
+        "title": "Lesson",
+        "content_ref": digest,
+        "order": 0,
+    }
+    assert archive.archive_lesson_plan("u", "p")
+
+    out = tmp_path / "users.ndjson"
+    transfer.export_users(str(out), "u")
+
+    target = use_fake_db(FakeClient())
+    transfer.import_users(str(out))
+    assert f"lessonContent/{digest}" in target.store
+
+    assert utils.get_lessons("u", "p")[0]["content"] == "archived lesson body"
+
+
+def test_export_resumes_after_the_last_finished_user(fake_db, tmp_path):
+    fake_db.store["users/a"] = {"name": "A"}
+    fake_db.store["users/b"] = {"name": "B"}
+    out, checkpoint = tmp_path / "users.ndjson", tmp_path / "checkpoint.json"
+
+    transfer.export_users(str(out), "a", checkpoint_path=str(checkpoint))
+    transfer.export_users(str(out), checkpoint_path=str(checkpoint))
+
+    with open(out, "rb") as f:
+        users = [
+            record["userId"]
+            for record, _ in transfer.read_records(f, "ndjson")
+            if record["type"] == "user_end"
+        ]
+    assert users == ["a", "b"]
+
+
+def test_checkpoint_without_output_file_starts_over(fake_db, tmp_path):
+    fake_db.store["users/a"] = {"name": "A"}
+    fake_db.store["users/b"] = {"name": "B"}
+    out, checkpoint = tmp_path / "users.ndjson", tmp_path / "checkpoint.json"
+
+    transfer.export_users(str(out), "a", checkpoint_path=str(checkpoint))
+    out.unlink()
+    transfer.export_users(str(out), checkpoint_path=str(checkpoint))
+
+    data = out.read_bytes()
+    assert b"\0" not in data
+    with open(out, "rb") as f:
+        users = [
+            record["userId"]
+            for record, _ in transfer.read_records(f, "ndjson")
+            if record["type"] == "user_end"
+        ]
+    assert users == ["a", "b"]
+
+
+def test_msgpack_round_trips_firestore_and_naive_datetimes(tmp_path):
+    pytest.importorskip("msgpack")
+    aware = DatetimeWithNanoseconds(2026, 3, 4, 5, 6, 7, 8000, tzinfo=timezone.utc)
+    records = [
+        {"type": "doc", "at": aware, "raw": b"\x00\x01"},
+        {"type": "doc", "at": datetime(2026, 1, 2, 3, 4, 5)},
+    ]
+    path = tmp_path / "users.msgpack"
+    with open(path, "wb") as f:
+        writer = transfer.RecordWriter(f, "msgpack")
+        for record in records:
+            writer.write(record)
+
+    with open(path, "rb") as f:
+        restored = [record for record, _ in transfer.read_records(f, "msgpack")]
+    assert restored[0] == {"type": "doc", "at": aware, "raw": b"\x00\x01"}
+    # Naive datetimes are stored as UTC, the same as Firestore does
+    assert restored[1]["at"] == datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)